@@ -0,0 +1 @@
+"""Throughput benchmarks of tap-logic4 against a local stub of the Logic4 API."""
@@ -0,0 +1,3 @@
+from benchmarks.suite import cli
+
+cli()
@@ -0,0 +1,121 @@
+"""In-process micro-benchmarks of the tap's per-page and per-record hot paths.
+
+Each case times the code the tap runs now against the code it replaced, on the
+same synthetic input, so the gain of a change can be reproduced on any machine.
+"""
+
+import datetime
+import json
+import os
+import tempfile
+import time
+from typing import Callable, Dict, Iterable, List
+
+import pytz
+import requests
+from singer_sdk.helpers.jsonpath import extract_jsonpath
+
+from benchmarks.stub import StubProfile, SyntheticData
+
+
+def _response(payload: dict) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response._content = json.dumps(payload).encode("utf-8")
+    return response
+
+
+def _streams(names: Iterable[str]) -> dict:
+    from benchmarks.suite import BASE_CONFIG
+    from tap_logic4.tap import TapLogic4
+
+    with tempfile.TemporaryDirectory(prefix="tap-logic4-micro-") as work_dir:
+        config = os.path.join(work_dir, "config.json")
+        with open(config, "w") as outfile:
+            json.dump(BASE_CONFIG, outfile)
+        tap = TapLogic4(config=[config])
+    return {name: tap.streams[name] for name in names}
+
+
+def _best_of(repeat: int, run: Callable[[], int]) -> float:
+    """Return the fastest of ``repeat`` runs in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def decode_page(records: int = 10000, repeat: int = 5) -> Dict[str, float]:
+    """Read RecordsCounter and the records of one products page."""
+    data = SyntheticData(StubProfile(products=records))
+    payload = {
+        "Records": [data.product(index) for index in range(records)],
+        "RecordsCounter": records,
+    }
+    pages = [_response(payload) for _ in range(repeat * 2)]
+    stream = _streams(["products"])["products"]
+
+    def reference() -> int:
+        # the body was decoded for RecordsCounter, then again for the JSONPath
+        response = pages.pop()
+        response.json().get("RecordsCounter")
+        return sum(1 for _ in extract_jsonpath("$.Records[*]", response.json()))
+
+    def tap() -> int:
+        from tap_logic4.client import get_records_counter
+
+        response = pages.pop()
+        count = sum(1 for _ in stream.parse_response(response))
+        get_records_counter(response)
+        return count
+
+    return {
+        "records": records,
+        "reference_seconds": _best_of(repeat, reference),
+        "tap_seconds": _best_of(repeat, tap),
+    }
+
+
+def post_process(records: int = 100000, repeat: int = 5) -> Dict[str, float]:
+    """Post-process one page of orders."""
+    data = SyntheticData(StubProfile(orders=records))
+    rows: List[dict] = data.orders({"SkipRecords": 0, "TakeRecords": records})
+    stream = _streams(["orders"])["orders"]
+    stream._window_end = stream._changed_at_now()
+
+    def reference() -> int:
+        # a timezone lookup and a formatted timestamp for every record
+        for row in rows:
+            now = datetime.datetime.now(pytz.timezone("Europe/Amsterdam"))
+            row["ChangedAt"] = now.strftime("%Y-%m-%dT%H:%M:%S.%f")
+        return len(rows)
+
+    def tap() -> int:
+        for row in rows:
+            stream.post_process(row, None)
+        return len(rows)
+
+    return {
+        "records": records,
+        "reference_seconds": _best_of(repeat, reference),
+        "tap_seconds": _best_of(repeat, tap),
+    }
+
+
+MICRO_CASES: Dict[str, Callable[..., Dict[str, float]]] = {
+    "decode_page": decode_page,
+    "post_process": post_process,
+}
+
+
+def format_result(name: str, result: Dict[str, float]) -> str:
+    """Return the records/s of both code paths of a case on one line."""
+    reference = result["records"] / (result["reference_seconds"] or 1e-9)
+    tap = result["records"] / (result["tap_seconds"] or 1e-9)
+    return (
+        f"{name:<26} {result['records']:>8} records "
+        f"{reference:>12.0f} rec/s before {tap:>12.0f} rec/s now "
+        f"{tap / reference:>6.1f}x"
+    )
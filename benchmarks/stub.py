@@ -0,0 +1,524 @@
+"""Local stub of the Logic4 API serving synthetic data or recorded responses."""
+
+import bisect
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import requests
+
+API_URL = "https://api.logic4server.nl"
+TOKEN_URL = "https://idp.logic4server.nl/token"
+TOKEN_PATH = "/token"
+
+# request fields that change on every run and are left out of the cassette key
+VOLATILE_FIELDS = ("DateTimeChangedTo",)
+
+# synthetic records change between these dates, in ascending id order
+_CHANGED_FROM = datetime.datetime(2021, 1, 1)
+_CHANGED_TO = datetime.datetime(2024, 1, 1)
+_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+class StubProfile(NamedTuple):
+    """Size, latency and page behaviour of the synthetic Logic4 API."""
+
+    products: int = 10000
+    orders: int = 2000
+    invoices: int = 2000
+    buy_orders: int = 500
+    rows_per_order: int = 3
+    stock_products: int = 5000
+    warehouses: int = 2
+    suppliers: int = 200
+    suppliers_per_product: int = 2
+    # seconds added to every response, and per record in it
+    latency: float = 0.005
+    latency_per_record: float = 0.0
+    # up to this many seconds more per response, so responses finish out of order
+    latency_jitter: float = 0.0
+    # most records returned per page, whatever TakeRecords asks for (0: no cap)
+    page_cap: int = 0
+    # requests per second answered before the stub returns 429 (0: no limit)
+    throttle_rate: float = 0.0
+    retry_after: float = 1.0
+    # every n-th data request fails with a 503 (0: never)
+    error_every: int = 0
+    # data requests after the first n fail with a 400, e.g. to interrupt a sync
+    fail_after: int = 0
+    token_ttl: int = 3600
+    gzip: bool = False
+
+    def scaled(self, factor: float) -> "StubProfile":
+        """Return the profile with all record counts multiplied by ``factor``."""
+        sizes = (
+            "products",
+            "orders",
+            "invoices",
+            "buy_orders",
+            "stock_products",
+            "suppliers",
+        )
+        return self._replace(
+            **{name: max(int(getattr(self, name) * factor), 1) for name in sizes}
+        )
+
+
+def _changed_at(index: int, count: int) -> str:
+    step = (_CHANGED_TO - _CHANGED_FROM) / max(count, 1)
+    return (_CHANGED_FROM + step * index).strftime(_DATE_FORMAT)
+
+
+def _page(records: List[dict]) -> dict:
+    return {"Records": records, "RecordsCounter": len(records)}
+
+
+def cassette_key(path: str, body: bytes) -> str:
+    """Return the file name of a recorded response to ``body`` sent to ``path``."""
+    try:
+        payload = json.loads(body or b"null")
+    except ValueError:
+        payload = body.decode("utf-8", "replace")
+    if isinstance(payload, dict):
+        payload = {k: v for k, v in payload.items() if k not in VOLATILE_FIELDS}
+    canonical = json.dumps([path, payload], sort_keys=True)
+    digest = hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:16]
+    return f"{path.rsplit('/', 1)[-1]}-{digest}.json"
+
+
+class SyntheticData:
+    """Deterministic Logic4 records, built from their index on demand."""
+
+    def __init__(self, profile: StubProfile):
+        self.profile = profile
+        # ids of every IsVisibleOnWebShop/IsVisibleInLogic4 partition with their
+        # change dates, both ascending, so date filters are a bisect
+        self._products: Dict[Tuple[bool, bool], Tuple[List[int], List[str]]] = {}
+        for index in range(profile.products):
+            ids, dates = self._products.setdefault(self._visibility(index), ([], []))
+            ids.append(index)
+            dates.append(_changed_at(index, profile.products))
+        self._orders = [_changed_at(i, profile.orders) for i in range(profile.orders)]
+        self._invoices = [
+            _changed_at(i, profile.invoices) for i in range(profile.invoices)
+        ]
+
+    @staticmethod
+    def _visibility(index: int) -> Tuple[bool, bool]:
+        return index % 5 != 4, index % 7 != 6
+
+    def product(self, index: int) -> dict:
+        web, logic4 = self._visibility(index)
+        changed = _changed_at(index, self.profile.products)
+        return {
+            "ProductId": index + 1,
+            "SubUnit_ParentId": None,
+            "ProductCode": f"P{index + 1:08d}",
+            "ProductName1": f"Product {index + 1}",
+            "ProductName2": f"Variant {index % 13}",
+            "ProductInfo": "Synthetic product used by the tap-logic4 benchmarks.",
+            "StatusId": index % 4,
+            "Statusname": ("Active", "Expired", "Blocked", "New")[index % 4],
+            "BrandId": index % 50,
+            "Brandname": f"Brand {index % 50}",
+            "Imagename1": f"p{index + 1}.jpg",
+            "ImageUrl1": f"https://images.example.com/p{index + 1}.jpg",
+            "Unit": "pcs",
+            "UnitId": 1,
+            "MinSaleAmount": 1.0,
+            "SaleCountIncrement": 1.0,
+            "MinBuyAmount": float(index % 10 + 1),
+            "VatPercent": 21.0,
+            "VatCodeId": 1,
+            "SellPriceGross": round(10 + (index % 997) * 0.37, 2),
+            "Weight": round((index % 300) * 0.01, 2),
+            "Volume": round((index % 200) * 0.002, 3),
+            "Offer": {
+                "StartDate": changed,
+                "EndDate": changed,
+                "FromPrice": 20.0,
+                "ToPrice": 17.5,
+                "OfferGroupId": index % 3,
+                "ProductId": index + 1,
+            }
+            if index % 10 == 0
+            else None,
+            "SellPriceAdvice": round(12 + (index % 997) * 0.4, 2),
+            "BuyPrice": round(6 + (index % 997) * 0.2, 2),
+            "ProductGroupId1": index % 40,
+            "IsComposedProduct": index % 25 == 0,
+            "IsAssemblyProduct": False,
+            "FreeStock": float(index % 120),
+            "CreditorDiscountGroupId": index % 6,
+            "DateTimeLastChanged": changed,
+            "DateTimeAdded": _CHANGED_FROM.strftime(_DATE_FORMAT),
+            "BarCode1": f"87{index + 1:011d}",
+            "FreeValues": [
+                {"Key": "Colour", "Value": ("red", "green", "blue")[index % 3]},
+                {"Key": "Size", "Value": str(index % 48)},
+            ],
+            "IsVisibleOnWebShop": web,
+            "IsVisibleInLogic4": logic4,
+        }
+
+    def products(self, body: dict) -> List[dict]:
+        web, logic4 = body.get("IsVisibleOnWebShop"), body.get("IsVisibleInLogic4")
+        lower = (body.get("DateTimeChangedFrom") or "").rstrip("Z")
+        upper = (body.get("DateTimeChangedTo") or "").rstrip("Z")
+        selected = []
+        for pair, (ids, dates) in self._products.items():
+            if web is not None and pair[0] != web:
+                continue
+            if logic4 is not None and pair[1] != logic4:
+                continue
+            start = bisect.bisect_left(dates, lower) if lower else 0
+            end = bisect.bisect_right(dates, upper) if upper else len(ids)
+            selected.extend(ids[start:end])
+        selected.sort()
+        return self._slice(body, selected, self.product)
+
+    def _transaction(self, index: int, changed: str) -> dict:
+        return {
+            "Id": index + 1,
+            "DebtorId": index % 300 + 1,
+            "AmountEx": round(50 + (index % 500) * 1.3, 2),
+            "VATPercentage": 21.0,
+            "AmountIncl": round((50 + (index % 500) * 1.3) * 1.21, 2),
+            "ShippingCost": 4.95,
+            "IsPaid": index % 3 != 0,
+            "CreationDate": changed,
+            "Description": f"Order {index + 1}",
+            "Reference": f"REF-{index + 1}",
+            "BranchId": 1,
+            "Notes": "",
+        }
+
+    def orders(self, body: dict, dates: Optional[List[str]] = None) -> List[dict]:
+        dates = self._orders if dates is None else dates
+        lower = (body.get("ChangedAfter") or "").rstrip("Z")
+        start = bisect.bisect_left(dates, lower) if lower else 0
+        return self._slice(
+            body, range(start, len(dates)), lambda i: self._transaction(i, dates[i])
+        )
+
+    def invoices(self, body: dict) -> List[dict]:
+        return self.orders(body, self._invoices)
+
+    def order_rows(self, order_id: int) -> List[dict]:
+        return [
+            {
+                "Id": order_id * 100 + row,
+                "OrderId": order_id,
+                "ProductId": (order_id * 7 + row) % max(self.profile.products, 1) + 1,
+                "Description": f"Row {row} of order {order_id}",
+                "Qty": float(row + 1),
+                "BuyPrice": 6.5,
+                "GrossPrice": 12.0,
+                "InclPrice": 14.52,
+                "DiscountPercent": 0.0,
+                "QtyReserved": 0.0,
+                "IsAssemblyChild": False,
+            }
+            for row in range(self.profile.rows_per_order)
+        ]
+
+    def buy_order(self, index: int) -> dict:
+        return {
+            "Id": index + 1,
+            "AmountOfRows": float(self.profile.rows_per_order),
+            "BranchId": 1,
+            "BuyOrderClosed": index % 2 == 0,
+            "CreatedAt": _changed_at(index, self.profile.buy_orders),
+            "CreditorCompanyName": f"Supplier {index % self.profile.suppliers + 1}",
+            "CreditorId": index % self.profile.suppliers + 1,
+            "Remarks": "",
+        }
+
+    def buy_order_rows(self, order_id: int) -> List[dict]:
+        return [
+            {
+                "BuyOrderRowId": order_id * 100 + row,
+                "BuyOrderId": order_id,
+                "ProductId": (order_id * 11 + row) % max(self.profile.products, 1) + 1,
+                "ProductCode": f"P{order_id:08d}",
+                "QtyToDeliver": float(row + 1),
+                "QtyToOrder": float(row + 1),
+                "Price": 6.5,
+                "Description": f"Row {row} of buy order {order_id}",
+            }
+            for row in range(self.profile.rows_per_order)
+        ]
+
+    def stock(self, index: int) -> dict:
+        product, warehouse = divmod(index, self.profile.warehouses)
+        return {
+            "ProductId": product + 1,
+            "ProductCode": f"P{product + 1:08d}",
+            "WarehouseId": warehouse + 1,
+            "Qty": float((product * 3 + warehouse) % 250),
+            "QtyReserved": float(product % 5),
+            "FreeStock": float((product * 3 + warehouse) % 250 - product % 5),
+        }
+
+    def supplier(self, index: int) -> dict:
+        return {
+            "Id": index + 1,
+            "CompanyName": f"Supplier {index + 1}",
+            "EmailAddress": f"supplier{index + 1}@example.com",
+            "FirstName": "Jan",
+            "LastName": f"Jansen {index + 1}",
+            "TelephoneNumber": "+31201234567",
+        }
+
+    def suppliers_for_product(self, product_id: int) -> List[dict]:
+        return [
+            {
+                "ProductId": product_id,
+                "CreditorId": (product_id + n) % self.profile.suppliers + 1,
+                "CreditorName": (
+                    f"Supplier {(product_id + n) % self.profile.suppliers + 1}"
+                ),
+                "CreditorProductCode": f"S{product_id}-{n}",
+                "IsActive": n == 0,
+                "CreditorBuyPrices": [
+                    {"Key": 1, "Value": 6.5},
+                    {"Key": 10, "Value": 6.0},
+                ],
+            }
+            for n in range(self.profile.suppliers_per_product)
+        ]
+
+    def _slice(self, body: dict, indices, build) -> List[dict]:
+        skip = int(body.get("SkipRecords") or 0)
+        take = int(body.get("TakeRecords") or 100)
+        if self.profile.page_cap:
+            take = min(take, self.profile.page_cap)
+        end = skip + take
+        return [build(index) for index in indices[skip:end]]
+
+    def _buy_orders(self, body: dict) -> List[dict]:
+        return self._slice(body, range(self.profile.buy_orders), self.buy_order)
+
+    def _stock(self, body: dict) -> List[dict]:
+        count = self.profile.stock_products * self.profile.warehouses
+        return self._slice(body, range(count), self.stock)
+
+    def _suppliers(self, body: dict) -> List[dict]:
+        return self._slice(body, range(self.profile.suppliers), self.supplier)
+
+    def _suppliers_for_products(self, body: dict) -> List[dict]:
+        ids = body.get("ProductIds") or range(1, self.profile.products + 1)
+        records = [r for i in ids for r in self.suppliers_for_product(int(i))]
+        return self._slice(body, records, lambda record: record)
+
+    def respond(self, endpoint: str, body) -> Optional[dict]:
+        """Return the response to a request of ``endpoint``, None if it is unknown."""
+        records = {
+            "GetProducts": self.products,
+            "GetOrders": self.orders,
+            "GetInvoices": self.invoices,
+            "GetOrderRows": lambda body: self.order_rows(int(body["OrderId"])),
+            "GetInvoiceRows": lambda body: self.order_rows(int(body["OrderId"])),
+            "GetBuyOrders": self._buy_orders,
+            "GetBuyOrderRows": lambda body: self.buy_order_rows(int(body)),
+            "GetStockForWarehouses": self._stock,
+            "GetCreditors": self._suppliers,
+            "GetSuppliersForProduct": lambda body: self.suppliers_for_product(
+                int(body)
+            ),
+            "GetSuppliersForProducts": self._suppliers_for_products,
+        }.get(endpoint)
+        if records is None:
+            return None
+        return _page(records(body))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # send headers and body without waiting for delayed ACKs
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.headers.get("Content-Encoding") == "gzip":
+            raw = gzip.decompress(raw)
+        stub: Logic4Stub = self.server.stub
+        status, headers, data = stub.handle(self.path, raw, self.headers)
+        accepted = self.headers.get("Accept-Encoding", "")
+        if data and stub.profile.gzip and "gzip" in accepted:
+            data = gzip.compress(data, compresslevel=1)
+            headers["Content-Encoding"] = "gzip"
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        stub.count("bytes", len(data))
+
+
+class Logic4Stub:
+    """Local HTTP server standing in for the Logic4 API and its token endpoint.
+
+    By default it answers with synthetic records shaped by ``profile``. With
+    ``cassette`` it replays the responses saved in that directory instead, and
+    with ``record`` as well it forwards every request to the real API and saves
+    the response there first. Token responses are never saved.
+    """
+
+    def __init__(
+        self,
+        profile: Optional[StubProfile] = None,
+        cassette: Optional[str] = None,
+        record: bool = False,
+        upstream: str = API_URL,
+        token_upstream: str = TOKEN_URL,
+    ):
+        self.profile = profile or StubProfile()
+        self.cassette = cassette
+        self.record = record
+        self.upstream = upstream.rstrip("/")
+        self.token_upstream = token_upstream
+        self.data = None if cassette else SyntheticData(self.profile)
+        self.requests: Counter = Counter()
+        self._lock = threading.Lock()
+        self._hits: List[float] = []
+        self._server: Optional[ThreadingHTTPServer] = None
+        if record:
+            os.makedirs(cassette, exist_ok=True)
+            self._session = requests.Session()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    @property
+    def token_url(self) -> str:
+        return f"{self.url}{TOKEN_PATH}"
+
+    def start(self, port: int = 0) -> "Logic4Stub":
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "Logic4Stub":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.requests[name] += value
+
+    def reset(self) -> Counter:
+        """Return the request counters since the last reset and clear them."""
+        with self._lock:
+            counters, self.requests = self.requests, Counter()
+            self._hits = []
+        return counters
+
+    def _throttled(self) -> bool:
+        if not self.profile.throttle_rate:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            self._hits = [hit for hit in self._hits if hit > now - 1]
+            if len(self._hits) >= self.profile.throttle_rate:
+                return True
+            self._hits.append(now)
+        return False
+
+    def handle(self, path: str, raw: bytes, headers) -> Tuple[int, dict, bytes]:
+        """Return the status, headers and body of the response to a request."""
+        json_type = {"Content-Type": "application/json"}
+        if path == TOKEN_PATH:
+            self.count("token")
+            if self.record:
+                response = self._forward(self.token_upstream, raw, headers)
+                return response.status_code, json_type, response.content
+            token = {"access_token": "stub-token", "expires_in": self.profile.token_ttl}
+            return 200, json_type, json.dumps(token).encode()
+
+        self.count(path)
+        self.count("data")
+        if self.cassette:
+            return self._replay(path, raw, headers)
+        if self._throttled():
+            self.count("throttled")
+            return 429, {"Retry-After": str(self.profile.retry_after)}, b""
+        error_every = self.profile.error_every
+        if error_every and self.requests[path] % error_every == 0:
+            self.count("errors")
+            return 503, {}, b""
+        if self.profile.fail_after and self.requests["data"] > self.profile.fail_after:
+            self.count("errors")
+            return 400, {}, b""
+        body = json.loads(raw or b"null")
+        response = self.data.respond(path.rsplit("/", 1)[-1], body)
+        if response is None:
+            return 404, {}, b""
+        delay = self.profile.latency + self.profile.latency_per_record * len(
+            response["Records"]
+        )
+        if self.profile.latency_jitter:
+            delay += random.random() * self.profile.latency_jitter
+        if delay:
+            time.sleep(delay)
+        return 200, json_type, json.dumps(response).encode()
+
+    def _forward(self, url: str, raw: bytes, headers) -> requests.Response:
+        forwarded = {
+            name: headers[name]
+            for name in ("Authorization", "Content-Type")
+            if headers.get(name)
+        }
+        return self._session.post(url, data=raw, headers=forwarded, timeout=(10, 300))
+
+    def _replay(self, path: str, raw: bytes, headers) -> Tuple[int, dict, bytes]:
+        file_name = os.path.join(self.cassette, cassette_key(path, raw))
+        if self.record:
+            response = self._forward(f"{self.upstream}{path}", raw, headers)
+            entry = {
+                "path": path,
+                "request": raw.decode("utf-8", "replace"),
+                "status": response.status_code,
+                "headers": {
+                    name: response.headers[name]
+                    for name in ("Content-Type", "Retry-After")
+                    if name in response.headers
+                },
+                "body": response.text,
+            }
+            # throttled and failed responses are served, but not saved
+            if response.status_code == 200:
+                with open(file_name, "w") as outfile:
+                    json.dump(entry, outfile)
+        elif os.path.exists(file_name):
+            with open(file_name) as infile:
+                entry = json.load(infile)
+        else:
+            self.count("missing")
+            return 404, {}, f"No recorded response for {path}: {raw[:200]!r}".encode()
+        if self.profile.latency and not self.record:
+            time.sleep(self.profile.latency)
+        return entry["status"], entry["headers"], entry["body"].encode("utf-8")
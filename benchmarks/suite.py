@@ -0,0 +1,426 @@
+"""Benchmark cases, their runner and the comparison of stored results."""
+
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Mapping, Optional
+
+import click
+
+from benchmarks.micro import MICRO_CASES
+from benchmarks.micro import format_result as micro_result
+from benchmarks.stub import Logic4Stub, StubProfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+BASE_CONFIG = {
+    "public_key": "benchmark",
+    "company_key": "benchmark",
+    "username": "benchmark",
+    "secret_key": "benchmark",
+    "password": "benchmark",
+    "start_date": "2020-01-01T00:00:00Z",
+}
+
+# every top-level stream with its children, plus the page behaviours and
+# settings whose speed we want to follow
+CASES: Dict[str, dict] = {
+    "products": {"streams": ["products"]},
+    "products_page_cap": {"streams": ["products"], "profile": {"page_cap": 1000}},
+    "products_keyset": {
+        "streams": ["products"],
+        "profile": {"page_cap": 1000},
+        "config": {"keyset_pagination": True},
+    },
+    "supplier_products": {
+        "streams": ["products", "supplier_products"],
+        "profile": {"products": 2000},
+        "config": {"child_batch_size": 100},
+    },
+    "supplier_products_bulk": {"streams": ["supplier_products_bulk"]},
+    "stocks": {"streams": ["stocks"]},
+    "orders": {"streams": ["orders", "order_rows"]},
+    "orders_child_concurrency": {
+        "streams": ["orders", "order_rows"],
+        "config": {"child_concurrency": 8},
+    },
+    "orders_throttled": {
+        "streams": ["orders"],
+        "profile": {"throttle_rate": 20, "page_cap": 20},
+        "config": {"max_requests_per_second": 18},
+    },
+    "invoices": {
+        "streams": ["invoices", "invoice_rows"],
+        "config": {"sync_invoices": True},
+    },
+    "buy_orders": {"streams": ["buy_orders", "buy_orders_rows"]},
+    "suppliers": {"streams": ["suppliers"]},
+}
+
+# measurements compared between runs, and whether a higher value is better
+METRICS = {
+    "records_per_second": True,
+    "requests_per_second": True,
+    "cpu_seconds": False,
+    "peak_rss_mb": False,
+}
+
+
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(
+            ["git", *args], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def commit_id() -> str:
+    """Return the short id of the checked out commit, with ``-dirty`` for changes."""
+    commit = _git("rev-parse", "--short", "HEAD") or "unknown"
+    if _git("status", "--porcelain", "--untracked-files=no"):
+        commit += "-dirty"
+    return commit
+
+
+def _stream_paths(streams: List[str]) -> Dict[str, str]:
+    from tap_logic4.tap import STREAM_TYPES
+
+    paths = {}
+    for stream_class in STREAM_TYPES:
+        if stream_class.name in streams:
+            for path in (stream_class.path, getattr(stream_class, "batch_path", None)):
+                if path:
+                    paths.setdefault(path, stream_class.name)
+    return paths
+
+
+def run_worker(
+    stub: Logic4Stub,
+    streams: List[str],
+    config: str,
+    work_dir: str,
+    name: str,
+    state: Optional[str] = None,
+    output: Optional[str] = None,
+) -> dict:
+    """Sync ``streams`` in a new worker process against ``stub``.
+
+    The Singer messages are written to ``output``, or dropped without one.
+    """
+    spec_path = os.path.join(work_dir, f"{name}.spec.json")
+    result_path = os.path.join(work_dir, f"{name}.result.json")
+    with open(spec_path, "w") as outfile:
+        json.dump(
+            {
+                "api_url": stub.url,
+                "token_url": stub.token_url,
+                "config": config,
+                "state": state,
+                "streams": streams,
+                "output": output,
+            },
+            outfile,
+        )
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+    with open(os.path.join(work_dir, f"{name}.log"), "wb") as log:
+        process = subprocess.run(
+            [sys.executable, "-m", "benchmarks.worker", spec_path, result_path],
+            cwd=ROOT,
+            env=env,
+            stderr=log,
+        )
+    if process.returncode or not os.path.exists(result_path):
+        raise click.ClickException(
+            f"Worker of '{name}' exited with {process.returncode}, see {log.name}."
+        )
+    with open(result_path) as infile:
+        return json.load(infile)
+
+
+def run_case(
+    name: str,
+    case: Mapping,
+    work_dir: str,
+    scale: float = 1.0,
+    profile: Optional[Mapping] = None,
+    cassette: Optional[str] = None,
+) -> dict:
+    """Run one case against a fresh stub and return its result."""
+    stub_profile = StubProfile(**{**case.get("profile", {}), **(profile or {})})
+    stub_profile = stub_profile.scaled(scale)
+    config_path = os.path.join(work_dir, f"{name}.config.json")
+    with open(config_path, "w") as outfile:
+        json.dump({**BASE_CONFIG, **case.get("config", {})}, outfile)
+
+    with Logic4Stub(stub_profile, cassette=cassette) as stub:
+        result = run_worker(stub, case["streams"], config_path, work_dir, name)
+        counters = stub.reset()
+
+    paths = _stream_paths(case["streams"])
+    requests = {}
+    for path, stream in paths.items():
+        if counters[path]:
+            requests[stream] = requests.get(stream, 0) + counters[path]
+    total_records = sum(result["records"].values())
+    total_requests = sum(counters[path] for path in paths)
+    seconds = result["seconds"] or 1e-9
+    result.update(
+        {
+            "streams": {
+                stream: {
+                    "records": result["records"].get(stream, 0),
+                    "requests": requests.get(stream, 0),
+                }
+                for stream in case["streams"]
+            },
+            "total_records": total_records,
+            "total_requests": total_requests,
+            "token_requests": counters["token"],
+            "throttled_responses": counters["throttled"],
+            "missing_responses": counters["missing"],
+            "response_bytes": counters["bytes"],
+            "records_per_second": round(total_records / seconds, 1),
+            "requests_per_second": round(total_requests / seconds, 1),
+        }
+    )
+    del result["records"], result["state"]
+    return result
+
+
+def run_suite(
+    names: List[str],
+    scale: float = 1.0,
+    repeat: int = 1,
+    profile: Optional[Mapping] = None,
+    cassette: Optional[str] = None,
+) -> dict:
+    """Run the cases ``names`` ``repeat`` times each and keep their median run."""
+    results = {
+        "commit": commit_id(),
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "scale": scale,
+        "repeat": repeat,
+        "profile": dict(profile or {}),
+        "cassette": cassette,
+        "cases": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="tap-logic4-bench-") as work_dir:
+        for name in names:
+            runs = []
+            for _ in range(repeat):
+                runs.append(
+                    run_case(name, CASES[name], work_dir, scale, profile, cassette)
+                )
+            runs.sort(key=lambda run: run["seconds"])
+            result = runs[len(runs) // 2]
+            result["runs"] = [run["seconds"] for run in runs]
+            results["cases"][name] = result
+            click.echo(_format_result(name, result), err=True)
+    return results
+
+
+def save_results(results: dict, output: Optional[str] = None) -> str:
+    """Save ``results`` to ``output``, or to ``benchmarks/results/<commit>.json``."""
+    path = output or os.path.join(RESULTS_DIR, f"{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as outfile:
+        json.dump(results, outfile, indent=2)
+    return path
+
+
+def load_results(reference: str) -> dict:
+    """Load the results of a file, or of a commit saved in ``benchmarks/results``."""
+    path = reference
+    if not os.path.exists(path):
+        commit = _git("rev-parse", "--short", reference) or reference
+        path = os.path.join(RESULTS_DIR, f"{commit}.json")
+    if not os.path.exists(path):
+        raise click.ClickException(f"No benchmark results for '{reference}'.")
+    with open(path) as infile:
+        return json.load(infile)
+
+
+def compare_results(base: dict, new: dict, threshold: float = 0.1) -> List[dict]:
+    """Return the change of every metric of the cases in both results.
+
+    A change is a regression when the metric got worse by more than ``threshold``
+    (a fraction), or when a case wrote a different number of records.
+    """
+    rows = []
+    for name, new_case in new["cases"].items():
+        base_case = base["cases"].get(name)
+        if not base_case:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            before, after = base_case.get(metric), new_case.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = -change if higher_is_better else change
+            rows.append(
+                {
+                    "case": name,
+                    "metric": metric,
+                    "base": before,
+                    "new": after,
+                    "change": change,
+                    "regression": worse > threshold,
+                }
+            )
+        if base_case["total_records"] != new_case["total_records"]:
+            rows.append(
+                {
+                    "case": name,
+                    "metric": "total_records",
+                    "base": base_case["total_records"],
+                    "new": new_case["total_records"],
+                    "change": None,
+                    "regression": True,
+                }
+            )
+    return rows
+
+
+def _format_result(name: str, result: Mapping) -> str:
+    line = (
+        f"{name:<26} {result['total_records']:>8} records "
+        f"{result['records_per_second']:>10.1f} rec/s "
+        f"{result['requests_per_second']:>8.1f} req/s "
+        f"{result['cpu_seconds']:>7.2f}s cpu {result['peak_rss_mb']:>7.1f} MB"
+    )
+    if result.get("error"):
+        line += f"  ERROR {result['error']}"
+    return line
+
+
+@click.group()
+def cli() -> None:
+    """Benchmark tap-logic4 against a local stub of the Logic4 API."""
+
+
+@cli.command()
+@click.option("--case", "cases", multiple=True, type=click.Choice(sorted(CASES)))
+@click.option("--scale", type=float, default=1.0, help="Multiplies all record counts.")
+@click.option(
+    "--repeat", type=int, default=1, help="Runs per case, the median is kept."
+)
+@click.option(
+    "--profile",
+    "profile",
+    help="JSON object of stub settings applied to every case, e.g. "
+    '\'{"latency": 0.05}\'.',
+)
+@click.option(
+    "--cassette", type=click.Path(file_okay=False), help="Replay these responses."
+)
+@click.option("--output", type=click.Path(dir_okay=False), help="Results file.")
+def run(cases, scale, repeat, profile, cassette, output) -> None:
+    """Run the benchmark cases and save their results."""
+    results = run_suite(
+        list(cases) or list(CASES),
+        scale,
+        max(repeat, 1),
+        json.loads(profile) if profile else None,
+        cassette,
+    )
+    click.echo(f"Results saved to {save_results(results, output)}", err=True)
+    if any(case.get("error") for case in results["cases"].values()):
+        sys.exit(1)
+
+
+@cli.command()
+@click.argument("base")
+@click.argument("new")
+@click.option(
+    "--threshold", type=float, default=0.1, help="Allowed slowdown, 0.1 is 10%."
+)
+def compare(base, new, threshold) -> None:
+    """Compare the results of NEW with BASE, both a results file or a commit.
+
+    Exits with status 1 when a metric regressed by more than the threshold.
+    """
+    base_results, new_results = load_results(base), load_results(new)
+    click.echo(f"{base_results['commit']} -> {new_results['commit']}")
+    for setting in ("scale", "profile", "cassette"):
+        if base_results.get(setting) != new_results.get(setting):
+            click.echo(f"Warning: the runs used a different {setting}.", err=True)
+    rows = compare_results(base_results, new_results, threshold)
+    for row in rows:
+        change = "" if row["change"] is None else f"{row['change']:+8.1%}"
+        flag = "  REGRESSION" if row["regression"] else ""
+        click.echo(
+            f"{row['case']:<26} {row['metric']:<20} {row['base']:>12} "
+            f"{row['new']:>12} {change:>8}{flag}"
+        )
+    if any(row["regression"] for row in rows):
+        sys.exit(1)
+
+
+@cli.command()
+@click.option("--case", "cases", multiple=True, type=click.Choice(sorted(MICRO_CASES)))
+@click.option(
+    "--repeat", type=int, default=5, help="Runs per case, the fastest is kept."
+)
+def micro(cases, repeat) -> None:
+    """Time the per-page and per-record hot paths in process, before and now."""
+    for name in cases or MICRO_CASES:
+        result = MICRO_CASES[name](repeat=max(repeat, 1))
+        click.echo(micro_result(name, result))
+
+
+@cli.command()
+@click.argument("cassette", type=click.Path(file_okay=False))
+@click.option("--config", "config", required=True, type=click.Path(exists=True))
+@click.option("--case", "cases", multiple=True, type=click.Choice(sorted(CASES)))
+def record(cassette, config, cases) -> None:
+    """Sync the cases against the real API with CONFIG and save the responses.
+
+    The saved responses can then be replayed with ``run --cassette``.
+    Refreshed tokens are written to CONFIG as usual.
+    """
+    with tempfile.TemporaryDirectory(prefix="tap-logic4-record-") as work_dir:
+        for name in cases or CASES:
+            with Logic4Stub(cassette=cassette, record=True) as stub:
+                streams = CASES[name]["streams"]
+                result = run_worker(
+                    stub, streams, os.path.abspath(config), work_dir, name
+                )
+                counters = stub.reset()
+            requests = sum(n for path, n in counters.items() if path.startswith("/"))
+            click.echo(
+                f"{name}: {sum(result['records'].values())} records, "
+                f"{requests} requests"
+                + (f", ERROR {result['error']}" if result["error"] else ""),
+                err=True,
+            )
+
+
+@cli.command()
+@click.option("--port", type=int, default=8080)
+@click.option("--profile", help="JSON object of stub settings.")
+@click.option(
+    "--cassette", type=click.Path(file_okay=False), help="Replay these responses."
+)
+def serve(port, profile, cassette) -> None:
+    """Serve the stub until interrupted, e.g. to profile the tap by hand."""
+    stub = Logic4Stub(
+        StubProfile(**json.loads(profile)) if profile else None, cassette=cassette
+    )
+    stub.start(port)
+    click.echo(f"Logic4 stub listening on {stub.url}, tokens at {stub.token_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.stop()
@@ -0,0 +1,98 @@
+"""Sync one benchmark case against the stub and measure it.
+
+Run as ``python -m benchmarks.worker SPEC RESULT`` by the suite, one process per
+case, so peak RSS and CPU time belong to that case alone.
+"""
+
+import json
+import os
+import resource
+import sys
+import time
+
+
+def _patch_endpoints(api_url: str, token_url: str) -> None:
+    from tap_logic4.auth import Logic4Authenticator
+    from tap_logic4.client import Logic4Stream
+
+    Logic4Stream.url_base = api_url
+
+    @classmethod
+    def create_for_stream(cls, stream):
+        return cls(stream=stream, auth_endpoint=token_url, oauth_scopes="")
+
+    Logic4Authenticator.create_for_stream = create_for_stream
+
+
+def _select(tap, streams) -> None:
+    for name, stream in tap.streams.items():
+        selected = name in streams
+        for breadcrumb, metadata in stream.metadata.items():
+            if not breadcrumb:
+                metadata.selected = selected
+        stream._mask = None
+
+
+def _max_rss_mb() -> float:
+    # ru_maxrss also covers the parent process forked before the exec on Linux,
+    # the high water mark of our own memory is in /proc
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_case(spec: dict) -> dict:
+    """Sync the streams of ``spec`` and return the measurements."""
+    _patch_endpoints(spec["api_url"], spec["token_url"])
+    from tap_logic4.output import close_writer
+    from tap_logic4.tap import TapLogic4
+
+    tap = TapLogic4(config=[spec["config"]], state=spec.get("state"))
+    _select(tap, spec["streams"])
+    baseline_rss = _max_rss_mb()
+    before = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    error = None
+    try:
+        tap.sync_all()
+    except Exception as ex:
+        error = f"{type(ex).__name__}: {ex}".splitlines()[0]
+    writer = close_writer()
+    sys.stdout.flush()
+    seconds = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    return {
+        "seconds": round(seconds, 3),
+        "cpu_seconds": round(
+            after.ru_utime - before.ru_utime + after.ru_stime - before.ru_stime, 3
+        ),
+        "peak_rss_mb": _max_rss_mb(),
+        "baseline_rss_mb": baseline_rss,
+        "records": dict(writer.record_counts) if writer else {},
+        "state": writer.last_state if writer else None,
+        "error": error,
+    }
+
+
+def main(spec_path: str, result_path: str) -> None:
+    with open(spec_path) as infile:
+        spec = json.load(infile)
+    sys.stdout.flush()
+    # singer messages are produced and serialized, then dropped unless the spec
+    # asks for them
+    with open(spec.get("output") or os.devnull, "wb") as output:
+        os.dup2(output.fileno(), 1)
+    result = run_case(spec)
+    with open(result_path, "w") as outfile:
+        json.dump(result, outfile)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:3])
@@ -0,0 +1,211 @@
+"""Asyncio transport for the Logic4 API."""
+
+import asyncio
+import atexit
+import copy
+import threading
+import time
+from concurrent.futures import Future
+from datetime import timedelta
+from typing import Mapping, Optional, Tuple
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from singer_sdk.exceptions import RetriableAPIError
+
+from tap_logic4.transport import get_timeout, pool_size
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None  # type: ignore[assignment]
+
+_transport: Optional["AsyncTransport"] = None
+_transport_lock = threading.Lock()
+
+
+class AsyncTransport:
+    """Send prepared requests as coroutines on one event loop.
+
+    The loop runs in a daemon thread. Callers get a ``concurrent.futures.Future``
+    of a regular ``requests.Response``, so any number of requests can be in
+    flight without a thread per request.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="logic4-asyncio", daemon=True
+        )
+        self._thread.start()
+        self._session = asyncio.run_coroutine_threadsafe(
+            self._create_session(limit), self._loop
+        ).result()
+        atexit.register(self.close)
+
+    @staticmethod
+    async def _create_session(limit: int) -> "aiohttp.ClientSession":
+        connector = aiohttp.TCPConnector(limit=0, limit_per_host=limit)
+        return aiohttp.ClientSession(connector=connector, auto_decompress=True)
+
+    def submit(
+        self, request: requests.PreparedRequest, timeout: Tuple[float, float]
+    ) -> Future:
+        """Schedule a request and return a future of its response."""
+        return asyncio.run_coroutine_threadsafe(
+            self._send(request, timeout), self._loop
+        )
+
+    def send(
+        self, request: requests.PreparedRequest, timeout: Tuple[float, float]
+    ) -> requests.Response:
+        """Send a request and wait for its response."""
+        return self.submit(request, timeout).result()
+
+    async def _send(
+        self, request: requests.PreparedRequest, timeout: Tuple[float, float]
+    ) -> requests.Response:
+        headers = {
+            k: v for k, v in request.headers.items() if k.lower() != "content-length"
+        }
+        client_timeout = aiohttp.ClientTimeout(
+            sock_connect=timeout[0], sock_read=timeout[1]
+        )
+        start = time.monotonic()
+        try:
+            async with self._session.request(
+                str(request.method),
+                str(request.url),
+                data=request.body,
+                headers=headers,
+                timeout=client_timeout,
+                allow_redirects=False,
+            ) as resp:
+                content = await resp.read()
+        except asyncio.TimeoutError as ex:
+            raise requests.exceptions.ReadTimeout(str(ex), request=request)
+        except aiohttp.ClientError as ex:
+            raise requests.exceptions.ConnectionError(str(ex), request=request)
+
+        response = requests.Response()
+        response.status_code = resp.status
+        response.reason = resp.reason or ""
+        response.headers = CaseInsensitiveDict(resp.headers)
+        response.url = str(resp.url)
+        response.request = request
+        response.elapsed = timedelta(seconds=time.monotonic() - start)
+        response._content = content
+        response._content_consumed = True  # type: ignore[attr-defined]
+        return response
+
+    def close(self) -> None:
+        """Close the client session and stop the event loop."""
+        if self._loop.is_closed() or not self._loop.is_running():
+            return
+        try:
+            closed = asyncio.run_coroutine_threadsafe(self._session.close(), self._loop)
+            closed.result(5)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def get_async_transport(config: Mapping) -> AsyncTransport:
+    """Return the process-wide async transport."""
+    global _transport
+    if aiohttp is None:
+        raise RuntimeError(
+            "The 'async_transport' setting requires aiohttp, "
+            "install tap-logic4 with the 'async' extra."
+        )
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = AsyncTransport(pool_size(config))
+    return _transport
+
+
+class AsyncPage:
+    """Future-like page request running on the async transport.
+
+    The request is prepared by the caller and sent right away, ``result()``
+    validates the response and falls back to the stream's retrying synchronous
+    path for retriable failures.
+    """
+
+    def __init__(self, stream, context: Optional[dict], next_page_token, take=None):
+        self.stream = stream
+        self.context = context
+        self.next_page_token = next_page_token
+        self.take = take or stream.current_page_size
+        request = stream._prepare_page(context, next_page_token, self.take)
+        stream.request_scheduler.acquire(stream.name)
+        self._future = stream.async_transport.submit(
+            request, get_timeout(stream.config)
+        )
+
+    def done(self) -> bool:
+        return self._future.done()
+
+    def cancel(self) -> bool:
+        return self._future.cancel()
+
+    def result(self) -> requests.Response:
+        try:
+            response = self._future.result()
+            self.stream._check_response(response, self.context)
+        except (
+            RetriableAPIError,
+            requests.exceptions.Timeout,
+            requests.exceptions.ConnectionError,
+        ):
+            decorated_request = self.stream.request_decorator(self.stream._send_page)
+            return decorated_request(self.context, self.next_page_token, self.take)
+        response._logic4_take = self.take  # type: ignore[attr-defined]
+        return response
+
+
+class AsyncChildren:
+    """Future-like fetch of the child records of a chunk of parent contexts.
+
+    The first page of every child request is sent on the async transport when
+    the chunk is submitted, the records are parsed by the caller in ``result()``.
+    """
+
+    def __init__(self, child_streams: list, contexts: list) -> None:
+        self.child_streams = child_streams
+        self.contexts = contexts
+        self.pages = []
+        for stream in child_streams:
+            if stream.batch_size > 1:
+                ids = [context[stream.batch_key] for context in contexts]
+                batch_context = {stream.batch_param: ids}
+                self.pages.append([AsyncPage(stream, batch_context, None)])
+            else:
+                self.pages.append(
+                    [
+                        AsyncPage(stream, copy.copy(context), None)
+                        for context in contexts
+                    ]
+                )
+        self._result: Optional[list] = None
+
+    def done(self) -> bool:
+        return all(page.done() for pages in self.pages for page in pages)
+
+    def result(self) -> list:
+        if self._result is None:
+            result = []
+            for stream, pages in zip(self.child_streams, self.pages):
+                if stream.batch_size > 1:
+                    first = pages[0].result()
+                    batch = stream._fetch_batch(self.contexts, first_response=first)
+                    result.append(batch)
+                else:
+                    result.append(
+                        [
+                            list(stream._fetch_records(page.context, page.result()))
+                            for page in pages
+                        ]
+                    )
+            self._result = result
+        return self._result
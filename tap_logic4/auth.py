@@ -2,6 +2,10 @@
 
 
 import json
+import os
+import shutil
+import threading
+import time
 from datetime import datetime
 from typing import Optional
 
@@ -10,6 +14,14 @@ import requests
 from singer_sdk.authenticators import OAuthAuthenticator, SingletonMeta
 from singer_sdk.streams import Stream as RESTStreamBase
 
+from tap_logic4.aio import get_async_transport
+from tap_logic4.transport import get_session, get_timeout
+
+# refresh tokens this many seconds before they expire
+TOKEN_EXPIRY_MARGIN = 120
+# wait this long before retrying a failed background renewal
+RENEWAL_RETRY_DELAY = 30
+
 
 class Logic4Authenticator(OAuthAuthenticator, metaclass=SingletonMeta):
     """Authenticator class for Logic4."""
@@ -26,28 +38,64 @@ class Logic4Authenticator(OAuthAuthenticator, metaclass=SingletonMeta):
         )
         self._config_file = config_file
         self._tap = stream._tap
+        self._refresh_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._auth_header: dict = {}
+        self._token_deadline = 0.0
+        self._renewal_timer: Optional[threading.Timer] = None
+        self._set_token(
+            self._tap._config.get("access_token"), self._tap._config.get("expires_in")
+        )
+
+    def _set_token(self, access_token: Optional[str], expires_at) -> None:
+        """Cache the token, its header and its expiry as a monotonic deadline."""
+        self.access_token = access_token
+        self._auth_header = {"Authorization": f"Bearer {access_token}"}
+        if access_token and expires_at:
+            remaining = int(expires_at) - time.time() - TOKEN_EXPIRY_MARGIN
+            self._token_deadline = time.monotonic() + remaining
+            renewal_fraction = self.config.get("token_renewal_fraction")
+            if renewal_fraction and remaining > 0:
+                self._schedule_renewal(remaining * float(renewal_fraction))
+        else:
+            self._token_deadline = 0.0
+
+    def _schedule_renewal(self, delay: float) -> None:
+        """Renew the token in the background after ``delay`` seconds."""
+        if self._renewal_timer:
+            self._renewal_timer.cancel()
+        self._renewal_timer = threading.Timer(delay, self._renew_token)
+        self._renewal_timer.daemon = True
+        self._renewal_timer.start()
+
+    def _renew_token(self) -> None:
+        # requests keep using the current token until the new one is set
+        deadline = self._token_deadline
+        try:
+            with self._refresh_lock:
+                # a request may have refreshed the token while this one waited
+                if self._token_deadline == deadline:
+                    self.update_access_token()
+        except Exception as ex:
+            remaining = self._token_deadline - time.monotonic()
+            self.logger.warning(
+                f"Background token renewal failed, {remaining:.0f}s left on the "
+                f"current token: {ex}"
+            )
+            if remaining > 0:
+                self._schedule_renewal(min(RENEWAL_RETRY_DELAY, remaining / 2))
 
     @property
     def auth_headers(self) -> dict:
         if not self.is_token_valid():
-            self.update_access_token()
-        result = super().auth_headers
-        result["Authorization"] = f"Bearer {self._tap._config.get('access_token')}"
-        return result
+            # single flight: one caller refreshes, the others wait for its token
+            with self._refresh_lock:
+                if not self.is_token_valid():
+                    self.update_access_token()
+        return self._auth_header
 
     def is_token_valid(self) -> bool:
-        access_token = self._tap._config.get("access_token")
-        now = round(datetime.utcnow().timestamp())
-        expires_in = self._tap.config.get("expires_in")
-        if expires_in is not None:
-            expires_in = int(expires_in)
-        if not access_token:
-            return False
-
-        if not expires_in:
-            return False
-
-        return not ((expires_in - now) < 120)
+        return time.monotonic() < self._token_deadline
 
     @property
     def oauth_request_body(self) -> dict:
@@ -78,11 +126,27 @@ class Logic4Authenticator(OAuthAuthenticator, metaclass=SingletonMeta):
             f"Oauth request - endpoint: {self._auth_endpoint}, body: {self.oauth_request_body}"
         )
         headers = {"Content-Type": "application/x-www-form-urlencoded"}
-        token_response = requests.post(
-            self._auth_endpoint,
-            data=self.oauth_request_body,
-            headers=headers
-        )
+        session = get_session(self.config)
+        if self.config.get("async_transport"):
+            # the token request runs on the same event loop as the API requests
+            token_request = session.prepare_request(
+                requests.Request(
+                    "POST",
+                    self._auth_endpoint,
+                    data=self.oauth_request_body,
+                    headers=headers,
+                )
+            )
+            token_response = get_async_transport(self.config).send(
+                token_request, get_timeout(self.config)
+            )
+        else:
+            token_response = session.post(
+                self._auth_endpoint,
+                data=self.oauth_request_body,
+                headers=headers,
+                timeout=get_timeout(self.config),
+            )
         try:
             token_response.raise_for_status()
             self.logger.info("OAuth authorization attempt was successful.")
@@ -91,11 +155,51 @@ class Logic4Authenticator(OAuthAuthenticator, metaclass=SingletonMeta):
                 f"Failed OAuth login, response was '{token_response.text}'. {ex}"
             )
         token_json = token_response.json()
-        # Log the refresh_token
-        self.access_token = token_json["access_token"]
-        self._tap._config["access_token"] = token_json["access_token"]
         now = round(datetime.utcnow().timestamp())
+        self._tap._config["access_token"] = token_json["access_token"]
         self._tap._config["expires_in"] = now + token_json["expires_in"]
+        self._set_token(token_json["access_token"], self._tap._config["expires_in"])
+        self.persist_token()
+
+    def persist_token(self) -> None:
+        """Save the refreshed token to the config file.
+
+        The ``token_persistence`` setting picks how: ``sync`` (default) writes the
+        file before the refresh returns, ``async`` writes it from a background
+        thread and ``none`` keeps the token in memory only.
+        """
+        mode = self.config.get("token_persistence") or "sync"
+        if mode == "none":
+            return
+        token = {
+            "access_token": self._tap._config["access_token"],
+            "expires_in": self._tap._config["expires_in"],
+        }
+        if mode == "async":
+            threading.Thread(
+                target=self._write_config, args=(token,), name="logic4-token-writer"
+            ).start()
+        else:
+            self._write_config(token)
 
-        with open(self._tap.config_file, "w") as outfile:
-            json.dump(self._tap._config, outfile, indent=4)
+    def _write_config(self, token: dict) -> None:
+        with self._write_lock:
+            # replace the file a symlinked config points to, not the link
+            config_file = os.path.realpath(self._tap.config_file)
+            try:
+                # only the token changes, settings merged in from other config
+                # files (e.g. the shared settings of a fleet) stay out of this one
+                with open(config_file) as infile:
+                    config = json.load(infile)
+            except FileNotFoundError:
+                config = dict(self._tap._config)
+            config.update(token)
+            tmp_file = f"{config_file}.tmp"
+            # the config holds credentials, never let the new file be readable by
+            # others, then give it the permissions of the file it replaces
+            fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as outfile:
+                json.dump(config, outfile, indent=4)
+            if os.path.exists(config_file):
+                shutil.copymode(config_file, tmp_file)
+            os.replace(tmp_file, config_file)
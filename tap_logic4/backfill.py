@@ -0,0 +1,37 @@
+"""Planning of time-window backfills."""
+
+import datetime
+from typing import Callable, List, Tuple
+
+# windows are not split below this length, however many records they hold
+MIN_WINDOW = datetime.timedelta(hours=1)
+
+Window = Tuple[datetime.datetime, datetime.datetime]
+
+
+def plan_windows(
+    start: datetime.datetime,
+    end: datetime.datetime,
+    is_full: Callable[[datetime.datetime, datetime.datetime], bool],
+    min_window: datetime.timedelta = MIN_WINDOW,
+) -> List[Window]:
+    """Split ``start`` to ``end`` into windows holding a bounded number of records.
+
+    ``is_full(start, end)`` tells whether a window holds more records than one
+    window may have. Such windows are halved until they fit or are shorter than
+    ``min_window``, so quiet years end up as one window and busy months as many.
+    The windows are returned in chronological order and share their bounds.
+    """
+    windows: List[Window] = []
+    pending = [(start, end)]
+    while pending:
+        window_start, window_end = pending.pop()
+        if window_end - window_start >= 2 * min_window and is_full(
+            window_start, window_end
+        ):
+            middle = window_start + (window_end - window_start) / 2
+            pending.append((middle, window_end))
+            pending.append((window_start, middle))
+        else:
+            windows.append((window_start, window_end))
+    return windows
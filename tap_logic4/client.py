@@ -1,19 +1,73 @@
 """REST client handling, including Logic4Stream base class."""
 
+import copy
 import datetime
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import timedelta
-from typing import Any, Dict, Optional
+from queue import Empty, Queue
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union, cast
 
 import pytz
 import requests
 from memoization import cached
-from pendulum import parse
+from pendulum import DateTime, parse
+from singer_sdk.exceptions import RetriableAPIError
+from singer_sdk.helpers._singer import Catalog
+from singer_sdk.helpers.jsonpath import extract_jsonpath
 from singer_sdk.streams import RESTStream
+from singer_sdk.tap_base import Tap
 
-import singer
-from singer import StateMessage
-
+from tap_logic4.aio import AsyncChildren, AsyncPage, get_async_transport
 from tap_logic4.auth import Logic4Authenticator
+from tap_logic4.backfill import plan_windows
+from tap_logic4.fingerprint import FingerprintIndex
+from tap_logic4.json_stream import RecordsReader
+from tap_logic4.output import MessageWriter, get_writer
+from tap_logic4.paging import AdaptivePageSize, KeysetPage, KeysetToken
+from tap_logic4.schema import compile_conformer, compile_pruner
+from tap_logic4.throttle import (
+    THROTTLE_STATUSES,
+    RequestScheduler,
+    get_scheduler,
+    parse_retry_after,
+)
+from tap_logic4.transport import get_session, get_timeout, gzip_request_body
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+# NOTE: Logic4 uses Amsterdam timezone
+AMSTERDAM_TZ = pytz.timezone("Europe/Amsterdam")
+
+_NOT_DECODED = object()
+STREAM_CHUNK_SIZE = 64 * 1024
+# pages a partition may read ahead of the partition being written
+PARTITION_BUFFER_PAGES = 8
+_PARTITION_DONE = object()
+_NOT_COMPILED = object()
+
+
+def decode_response(response: requests.Response) -> Any:
+    """Return the JSON body of a response, decoding it only once per response."""
+    payload = getattr(response, "_logic4_payload", _NOT_DECODED)
+    if payload is _NOT_DECODED:
+        payload = orjson.loads(response.content) if orjson else response.json()
+        response._logic4_payload = payload  # type: ignore[attr-defined]
+    return payload
+
+
+def get_records_counter(response: requests.Response) -> Optional[int]:
+    """Return the RecordsCounter of a Logic4 page."""
+    payload = decode_response(response)
+    if isinstance(payload, dict):
+        return payload.get("RecordsCounter")
+    return None
 
 
 class Logic4Stream(RESTStream):
@@ -27,6 +81,90 @@ class Logic4Stream(RESTStream):
     rest_method = "POST"
     page_size = 10000
     from_to = True
+    # multi-ID endpoint used to fetch the records of many parents at once
+    batch_path: Optional[str] = None
+    batch_key: Optional[str] = None
+    batch_param: Optional[str] = None
+    # pages are addressed by SkipRecords offsets, so later pages can be prefetched
+    offset_paginated = True
+    # properties read by post_process or get_child_context, kept when deselected
+    required_properties: Tuple[str, ...] = ()
+    # integer ids of a record in the dedup index (see dedup_index_dir), and
+    # properties left out of its fingerprint
+    index_keys: Optional[Tuple[str, ...]] = None
+    index_ignored: Tuple[str, ...] = ()
+    # every sync reads the whole table, records not read again were removed
+    index_removals = False
+    # the children of a Logic4 stream are Logic4 streams too
+    child_streams: List["Logic4Stream"]  # type: ignore[assignment]
+    _tap: Tap
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._child_executor: Optional[ThreadPoolExecutor] = None
+        self._pending_children: deque = deque()
+        self._child_batch: list = []
+        self._page_executor: Optional[ThreadPoolExecutor] = None
+        self._page_executor_lock = threading.Lock()
+        self._partition_pages: list = []
+        self._page_sizer: Optional[AdaptivePageSize] = None
+        self._local = threading.local()
+        self._prefetched_records: Optional[list] = None
+        self._record_conformer = None
+        self._record_pruner = _NOT_COMPILED
+        self._schema_written = False
+        self._dedup_index: Optional[FingerprintIndex] = None
+
+    @property
+    def child_concurrency(self) -> int:
+        """Return the number of child requests kept in flight per parent stream."""
+        return max(int(self.config.get("child_concurrency") or 1), 1)
+
+    @property
+    def partition_concurrency(self) -> int:
+        """Return the number of stream partitions fetched at the same time."""
+        return max(int(self.config.get("partition_concurrency") or 1), 1)
+
+    @property
+    def page_prefetch(self) -> int:
+        """Return the number of pages requested ahead of the page being read."""
+        if not self.offset_paginated or self.keyset_paginated:
+            return 1
+        return max(int(self.config.get("page_prefetch") or 1), 1)
+
+    @property
+    def keyset_paginated(self) -> bool:
+        """Return whether pages continue from the last replication key."""
+        return bool(
+            self.config.get("keyset_pagination")
+            and self.replication_key
+            and self.rep_key_field
+            and self.from_to
+        )
+
+    @staticmethod
+    def keyset_value(value: Any) -> Optional[str]:
+        """Return a replication key value in the format of the From filters."""
+        if not isinstance(value, str) or len(value) < 19:
+            return None
+        if value[19:].endswith("Z") or "+" in value[19:] or "-" in value[19:]:
+            changed_at = cast(DateTime, parse(value))
+            value = changed_at.astimezone(AMSTERDAM_TZ).strftime("%Y-%m-%dT%H:%M:%S")
+        # the filters have a resolution of seconds, records sharing one are skipped
+        return value[:19] + "Z"
+
+    @property
+    def batch_size(self) -> int:
+        """Return how many parent ids are sent per request to ``batch_path``."""
+        if not self.batch_path:
+            return 1
+        return max(int(self.config.get("child_batch_size") or 1), 1)
+
+    def get_url(self, context: Optional[dict]) -> str:
+        if self.batch_path and self.batch_param and context:
+            if self.batch_param in context:
+                return "".join([self.url_base, self.batch_path])
+        return super().get_url(context)
 
     @property
     @cached
@@ -34,6 +172,29 @@ class Logic4Stream(RESTStream):
         """Return a new authenticator object."""
         return Logic4Authenticator.create_for_stream(self)
 
+    @property
+    def requests_session(self) -> requests.Session:
+        """Return the session shared by every stream and the authenticator."""
+        return get_session(self.config)
+
+    @property
+    def request_scheduler(self) -> RequestScheduler:
+        """Return the token bucket shared by the requests of all streams."""
+        return get_scheduler(self.config)
+
+    @property
+    def timeout(self):
+        """Return the (connect, read) request timeout."""
+        return get_timeout(self.config)
+
+    def prepare_request(
+        self, context: Optional[dict], next_page_token: Optional[Any]
+    ) -> requests.PreparedRequest:
+        request = super().prepare_request(context, next_page_token)
+        if self.config.get("gzip_requests"):
+            gzip_request_body(request)
+        return request
+
     @property
     def http_headers(self) -> dict:
         """Return the http headers needed."""
@@ -46,12 +207,265 @@ class Logic4Stream(RESTStream):
         self, response: requests.Response, previous_token: Optional[Any]
     ) -> Optional[Any]:
         """Return a token for identifying next page or None if no more pages."""
-        counter = response.json().get("RecordsCounter")
+        counter = get_records_counter(response)
         if counter:
+            keys = getattr(response, "_logic4_keys", None)
+            if keys is not None and not isinstance(previous_token, int):
+                next_page_token = keys.next_token(previous_token, counter)
+                if not next_page_token.ordered and (
+                    previous_token is None or previous_token.ordered
+                ):
+                    self.logger.warning(
+                        f"'{self.name}' records are not ordered by "
+                        f"{self.replication_key}, continuing with SkipRecords offsets."
+                    )
+                return next_page_token
             previous_token = previous_token or 0
             next_page_token = previous_token + counter
             return next_page_token
 
+    @property
+    def current_page_size(self) -> int:
+        """Return the TakeRecords of the next request."""
+        take = getattr(self._local, "take", None)
+        if take:
+            return take
+        if self._page_sizer:
+            return self._page_sizer.size
+        return self.page_size
+
+    def _init_page_sizer(self) -> None:
+        if not self.config.get("adaptive_page_size") or not self.offset_paginated:
+            return
+        # start from the size the last run settled on
+        initial = self.stream_state.get("page_size") or self.page_size
+        self._page_sizer = AdaptivePageSize(
+            initial, float(self.config.get("page_latency_target") or 10)
+        )
+
+    @property
+    def async_transport(self):
+        """Return the asyncio transport when it is enabled, otherwise None."""
+        if self.config.get("async_transport"):
+            return get_async_transport(self.config)
+        return None
+
+    def _prepare_page(self, context: Optional[dict], next_page_token, take: int):
+        self._local.take = take
+        try:
+            return self.prepare_request(context, next_page_token)
+        finally:
+            self._local.take = None
+
+    def _send_page(self, context: Optional[dict], next_page_token, take=None):
+        """Prepare and send one page request, retries prepare the request again."""
+        take = take or self.current_page_size
+        prepared_request = self._prepare_page(context, next_page_token, take)
+        try:
+            response = self._request(prepared_request, context)
+        except (RetriableAPIError, requests.exceptions.Timeout) as ex:
+            failed = getattr(ex, "response", None)
+            # a rate limited request says nothing about the size of the page
+            throttled = failed is not None and failed.status_code == 429
+            if self._page_sizer and not throttled and self._page_sizer.failed(take):
+                self.logger.info(
+                    f"Reduced page size of '{self.name}' to {self._page_sizer.size} "
+                    f"after {type(ex).__name__}."
+                )
+            raise
+        response._logic4_take = take  # type: ignore[attr-defined]
+        return response
+
+    def _account_page(
+        self, response: requests.Response, counter: Optional[int]
+    ) -> None:
+        if not self._page_sizer:
+            return
+        if self.stream_records:
+            nbytes = int(response.headers.get("Content-Length") or 0)
+        else:
+            nbytes = len(response.content)
+        elapsed = response.elapsed.total_seconds()
+        take = response._logic4_take  # type: ignore[attr-defined]
+        if self._page_sizer.record(take, counter or 0, elapsed, nbytes):
+            self.logger.info(
+                f"Page size of '{self.name}' is now {self._page_sizer.size} "
+                f"(last page: {counter} records, {nbytes} bytes, {elapsed:.1f}s)."
+            )
+
+    def _get_page_executor(self) -> ThreadPoolExecutor:
+        # partition workers may prefetch pages at the same time, they share one pool
+        with self._page_executor_lock:
+            if self._page_executor is None:
+                self._page_executor = ThreadPoolExecutor(
+                    max_workers=self.page_prefetch,
+                    thread_name_prefix=f"{self.name}-pages",
+                )
+            return self._page_executor
+
+    def request_records(self, context: Optional[dict], first_response=None):
+        decorated_request = self.request_decorator(self._send_page)
+        # an interrupted partition continues after its checkpoint
+        start_token = self._resume_token(context)
+        if self.page_prefetch <= 1:
+            yield from self._request_pages(
+                context, decorated_request, start_token, first_response
+            )
+        else:
+            yield from self._prefetch_pages(context, decorated_request, start_token)
+
+    def _request_pages(
+        self, context: Optional[dict], decorated_request, start_token, first_response
+    ):
+        """Yield the records of the pages, requesting one page at a time."""
+        next_page_token: Any = start_token
+        while True:
+            if first_response is not None:
+                resp, first_response = first_response, None
+            else:
+                resp = decorated_request(context, next_page_token)
+            yield from self.parse_response(resp)
+            if self.offset_paginated:
+                self._account_page(resp, get_records_counter(resp))
+            previous_token = copy.deepcopy(next_page_token)
+            next_page_token = self.get_next_page_token(resp, previous_token)
+            if next_page_token and next_page_token == previous_token:
+                raise RuntimeError(
+                    f"Loop detected in pagination. Pagination token "
+                    f"{next_page_token} is identical to prior token."
+                )
+            if not next_page_token:
+                return
+
+    def _prefetch_pages(self, context: Optional[dict], decorated_request, start_token):
+        """Yield the records of the pages in order, requesting the next ones ahead."""
+        depth = self.page_prefetch
+        pending: deque = deque()
+        next_skip = start_token or 0
+        while True:
+            while len(pending) < depth:
+                # the page size is fixed per slot so the following offsets stay right
+                take = self.current_page_size
+                page: Union[AsyncPage, "Future[requests.Response]"]
+                if self.async_transport:
+                    page = AsyncPage(self, context, next_skip, take)
+                else:
+                    page = self._get_page_executor().submit(
+                        decorated_request, context, next_skip, take
+                    )
+                pending.append((next_skip, take, page))
+                next_skip += take
+            skip, take, page = pending.popleft()
+            self.output.flush_if_due()
+            resp = page.result()
+            yield from self.parse_response(resp)
+            counter = get_records_counter(resp)
+            self._account_page(resp, counter)
+            if not counter:
+                break
+            if counter < take:
+                # a short page is normally the last one, but the server may also cap
+                # TakeRecords: drop the speculative pages and continue one at a time
+                for _, _, speculative in pending:
+                    speculative.cancel()
+                pending.clear()
+                depth = 1
+                next_skip = skip + counter
+
+    @property
+    def stream_records(self) -> bool:
+        """Return whether page bodies are parsed while they download."""
+        return bool(self.config.get("stream_records"))
+
+    def _request(
+        self, prepared_request: requests.PreparedRequest, context: Optional[dict]
+    ) -> requests.Response:
+        self.output.flush_if_due()
+        self.request_scheduler.acquire(self.name)
+        if self.async_transport:
+            response = self.async_transport.send(prepared_request, self.timeout)
+        elif self.stream_records:
+            response = self.requests_session.send(
+                prepared_request, stream=True, timeout=self.timeout
+            )
+        else:
+            return super()._request(prepared_request, context)
+        self._check_response(response, context)
+        return response
+
+    def _check_response(
+        self, response: requests.Response, context: Optional[dict]
+    ) -> None:
+        if self._LOG_REQUEST_METRICS:
+            self._write_request_duration_log(
+                endpoint=self.path, response=response, context=context, extra_tags={}
+            )
+        self.validate_response(response)
+
+    def validate_response(self, response: requests.Response) -> None:
+        if response.status_code in THROTTLE_STATUSES:
+            # every stream holds off until the company key may send again
+            self.request_scheduler.throttled(
+                self.name, parse_retry_after(response.headers.get("Retry-After"))
+            )
+        super().validate_response(response)
+
+    def _write_request_counters(self) -> None:
+        counters = self.request_scheduler.pop_counters(self.name)
+        if counters:
+            if (
+                counters["http_throttled_seconds"]
+                or counters["http_throttled_responses"]
+            ):
+                self.logger.info(
+                    f"'{self.name}' waited {counters['http_throttled_seconds']:.1f}s "
+                    f"for the request rate limit and got "
+                    f"{counters['http_throttled_responses']} throttled responses."
+                )
+            for metric, value in counters.items():
+                self._write_metric_log(
+                    {
+                        "type": "counter",
+                        "metric": metric,
+                        "value": round(value, 3),
+                        "tags": {"stream": self.name},
+                    },
+                    None,
+                )
+        for child_stream in self.child_streams:
+            child_stream._write_request_counters()
+
+    def parse_response(self, response: requests.Response):
+        if not self.keyset_paginated:
+            yield from self._parse_records(response)
+            return
+        # the next keyset page starts from the last key of this one
+        keys = KeysetPage()
+        response._logic4_keys = keys  # type: ignore[attr-defined]
+        for record in self._parse_records(response):
+            keys.add(self.keyset_value(record.get(self.replication_key)))
+            yield record
+
+    def _parse_records(self, response: requests.Response):
+        if (
+            self.stream_records
+            and self.records_jsonpath == "$.Records[*]"
+            and not response._content_consumed  # type: ignore[attr-defined]
+        ):
+            # yield each record as soon as it is parsed, RecordsCounter is cached
+            # on the response once the body has been read
+            reader = RecordsReader(response.iter_content(chunk_size=STREAM_CHUNK_SIZE))
+            yield from reader
+            response._logic4_payload = reader.payload  # type: ignore[attr-defined]
+            return
+
+        payload = decode_response(response)
+        if self.records_jsonpath != "$.Records[*]":
+            yield from extract_jsonpath(self.records_jsonpath, input=payload)
+        elif isinstance(payload, dict):
+            # read the records directly instead of walking them with JSONPath
+            yield from payload.get("Records") or []
+
     def get_url_params(
         self, context: Optional[dict], next_page_token: Optional[Any]
     ) -> Dict[str, Any]:
@@ -64,32 +478,137 @@ class Logic4Stream(RESTStream):
         start_date = self.config.get("start_date")
         if start_date:
             start_date = parse(self.config.get("start_date"))
-        rep_key = self.get_starting_timestamp(context)
+        # child streams have no bookmark, skip the state lookup (it may run in a worker)
+        rep_key = self.get_starting_timestamp(context) if self.replication_key else None
         date = rep_key or start_date
-        date = date.astimezone(pytz.timezone('Europe/Amsterdam'))
+        date = date.astimezone(AMSTERDAM_TZ)
         return date
 
     def prepare_request_payload(self, context, next_page_token):
         #NOTE: Logic4 uses Amsterdam timezone
+        payload = {}
+        payload["TakeRecords"] = self.current_page_size
+        if self._is_window(context):
+            # backfill window, see _plan_backfill
+            window_from, window_to = self.window_keys
+            payload[window_from] = context[window_from]
+            payload[window_to] = context[window_to]
+        elif self.replication_key and self.rep_key_field:
+            payload.update(self._filter_window(context))
+        if isinstance(next_page_token, KeysetToken):
+            if next_page_token.value:
+                payload[f"{self.rep_key_field}From"] = next_page_token.value
+            if next_page_token.skip:
+                payload["SkipRecords"] = next_page_token.skip
+        elif next_page_token:
+            payload["SkipRecords"] = next_page_token
+        if self.batch_param and context and self.batch_param in context:
+            payload[self.batch_param] = context[self.batch_param]
+        self.logger.info(f"Making request to '{self.path}' with payload: {payload}")
+        return payload
+
+    def _filter_window(self, context: Optional[dict]) -> dict:
+        """Return the change date filter of a request."""
+        if self.checkpoint_enabled:
+            checkpoint = self.get_context_state(context).get("checkpoint")
+            if checkpoint and checkpoint.get("window"):
+                # the window of an interrupted sync, so its offsets still apply
+                return dict(checkpoint["window"])
         start_date = self.get_starting_time(context)
-        if self.stream_state.get("replication_key_value"):
+        # resent records are suppressed by the dedup index, so the window may overlap
+        if not self.dedup_enabled and self.get_context_state(context).get(
+            "replication_key_value"
+        ):
             start_date = start_date + timedelta(seconds=1)
         start_date = (
             start_date.strftime("%Y-%m-%dT%H:%M:%SZ") if start_date else start_date
         )
-        now = datetime.datetime.now(pytz.timezone('Europe/Amsterdam')).strftime("%Y-%m-%dT%H:%M:%S")
-        payload = {}
-        payload["TakeRecords"] = self.page_size
-        if start_date and self.replication_key and self.rep_key_field:
-            if self.from_to:
-                payload[f"{self.rep_key_field}From"] = start_date
-                payload[f"{self.rep_key_field}To"] = now
-            else:
-                payload[self.rep_key_field] = start_date
-        if next_page_token:
-            payload["SkipRecords"] = next_page_token
-        self.logger.info(f"Making request to '{self.path}' with payload: {payload}")
-        return payload
+        now = datetime.datetime.now(AMSTERDAM_TZ).strftime("%Y-%m-%dT%H:%M:%S")
+        if not start_date:
+            return {}
+        if self.from_to:
+            return {
+                f"{self.rep_key_field}From": start_date,
+                f"{self.rep_key_field}To": now,
+            }
+        return {self.rep_key_field: start_date}
+
+    @property
+    def checkpoint_enabled(self) -> bool:
+        """Return whether partitions checkpoint their offset while they are synced.
+
+        The offset is the number of records written, so ``post_process`` of these
+        streams must not drop records.
+        """
+        return bool(
+            self.config.get("checkpoint_interval")
+            and self.offset_paginated
+            and self.replication_key
+            and self.rep_key_field
+            and self.from_to
+        )
+
+    def _start_checkpoint(self, context: Optional[dict]) -> dict:
+        """Return the checkpoint of a partition, or of the interrupted sync of it."""
+        state = self.get_context_state(context)
+        checkpoint = state.get("checkpoint")
+        if checkpoint is None:
+            checkpoint = {"skip": 0}
+            if not self._is_window(context):
+                # fix the window, the offsets are only valid within it
+                checkpoint["window"] = self._filter_window(context)
+            state["checkpoint"] = checkpoint
+        elif (
+            self.replication_key
+            and checkpoint.get("replication_key_value")
+            and "progress_markers" not in state
+        ):
+            # the records written before the interruption count for the bookmark
+            self._increment_stream_state(
+                {self.replication_key: checkpoint["replication_key_value"]},
+                context=context,
+            )
+            self.logger.info(
+                f"Resuming '{self.name}' {context or ''} after "
+                f"{checkpoint['skip']} records."
+            )
+        return checkpoint
+
+    def _resume_token(self, context: Optional[dict]) -> Optional[Any]:
+        """Return the page token of the first page, after the checkpointed records."""
+        if not self.checkpoint_enabled:
+            return None
+        checkpoint = self.get_context_state(context or None).get("checkpoint")
+        if not checkpoint or not checkpoint["skip"]:
+            return None
+        if self.keyset_paginated:
+            return KeysetToken(None, checkpoint["skip"])
+        return checkpoint["skip"]
+
+    def _checkpointed(self, context: Optional[dict], records):
+        """Yield the records of a partition, checkpointing how many were written."""
+        state = self.get_context_state(context)
+        checkpoint = self._start_checkpoint(context)
+        interval = float(self.config["checkpoint_interval"])
+        written = checkpoint["skip"]
+        last_checkpoint = time.monotonic()
+        for record in records:
+            yield record
+            # a record has been written once the next one is requested
+            written += 1
+            if time.monotonic() - last_checkpoint >= interval:
+                # the children of the counted records are written first, the
+                # STATE messages of their syncs still hold the previous offset
+                self._drain_children()
+                checkpoint["skip"] = written
+                progress = state.get("progress_markers") or {}
+                checkpoint["replication_key_value"] = progress.get(
+                    "replication_key_value"
+                )
+                self._write_state_message()
+                last_checkpoint = time.monotonic()
+        # the partition is complete, the next sync starts from its bookmark
+        del state["checkpoint"]
 
     def get_records(self, context: Optional[dict]):
         if context is None:
@@ -99,21 +618,500 @@ class Logic4Stream(RESTStream):
 
         if (self.name == "invoices" and not sync_invoices) or (self.name == "orders" and not sync_sales_orders):
             pass
+        elif self._prefetched_records is not None:
+            # records were already fetched by the parent's child worker pool
+            yield from self._prefetched_records
         else:
-            for record in self.request_records(context):
-                transformed_record = self.post_process(record, context)
-                if transformed_record is None:
+            pages = self._get_partition_pages(context)
+            if pages is not None:
+                records = self._read_partition_pages(pages)
+            else:
+                records = self._fetch_records(context)
+            if self.checkpoint_enabled:
+                records = self._checkpointed(context or None, records)
+            yield from records
+            # the SDK finalizes the partition bookmark next, which other streams
+            # may write out right away, so the children must be written first
+            self._drain_children()
+            if self.index_removals:
+                yield from self._removed_records()
+        if self._is_window(context):
+            self._finish_window(context)
+
+    @property
+    def record_pruner(self):
+        """Return the function dropping deselected properties, None without any."""
+        if self._record_pruner is _NOT_COMPILED:
+            self._record_pruner = self._compile_pruner()
+        return self._record_pruner
+
+    def _compile_pruner(self):
+        # bookmarks, keys and child contexts are read before records are conformed
+        keep = set(self.required_properties).union(self.primary_keys or [])
+        if self.replication_key:
+            keep.add(self.replication_key)
+        if self.batch_key:
+            keep.add(self.batch_key)
+        dropped = self.window_keys if self.backfill_enabled else ()
+        return compile_pruner(
+            self.schema, self.mask, keep, self.name, self.logger, dropped
+        )
+
+    def _fetch_records(self, context: dict, first_response=None):
+        prune = self.record_pruner
+        for record in self.request_records(context, first_response):
+            if prune is not None:
+                record = prune(record)
+            transformed_record = self.post_process(record, context)
+            if transformed_record is None:
+                continue
+            yield transformed_record
+
+    @property
+    def record_conformer(self):
+        """Return the record conforming function compiled from the stream schema."""
+        if self._record_conformer is None:
+            # without an input catalog, compiled on first use
+            self._record_conformer = self._compile_conformer()
+        return self._record_conformer
+
+    def _compile_conformer(self):
+        # backfill windows are partition keys, not record properties
+        dropped = self.window_keys if self.backfill_enabled else ()
+        return compile_conformer(
+            self.name, self.schema, self.mask, self.logger, dropped
+        )
+
+    def apply_catalog(self, catalog: Catalog) -> None:
+        """Apply the input catalog, then compile the record functions for it."""
+        super().apply_catalog(catalog)
+        # the selection and keys are known from here on, compile before the sync
+        # instead of on the first record
+        self._mask = None
+        self._record_pruner = self._compile_pruner()
+        self._record_conformer = self._compile_conformer()
+
+    @property
+    def output(self) -> MessageWriter:
+        """Return the shared buffered writer of Singer messages."""
+        return get_writer(self.config)
+
+    @property
+    def dedup_enabled(self) -> bool:
+        """Return whether unchanged records are suppressed with a fingerprint index."""
+        return bool(self.index_keys and self.config.get("dedup_index_dir"))
+
+    @property
+    def dedup_index(self) -> Optional[FingerprintIndex]:
+        """Return the fingerprint index of the records written by earlier syncs."""
+        if self._dedup_index is None and self.index_keys and self.dedup_enabled:
+            path = os.path.join(self.config["dedup_index_dir"], f"{self.name}.idx")
+            os.makedirs(self.config["dedup_index_dir"], exist_ok=True)
+            index = FingerprintIndex(path, self.index_keys, self.index_ignored)
+            index.load(self.logger)
+            self._dedup_index = index
+        return self._dedup_index
+
+    def _stream_names(self) -> List[str]:
+        """Return the names of this stream and its descendants."""
+        names = [self.name]
+        for child_stream in self.child_streams:
+            names.extend(child_stream._stream_names())
+        return names
+
+    def _removed_records(self) -> Iterator[dict]:
+        """Yield a record flagged as deleted for every key that wasn't read again."""
+        index = self.dedup_index
+        if index is None:
+            return
+        deleted_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        for key in list(index.removed()):
+            record: Dict[str, Any] = dict(zip(index.key_properties, key))
+            record["_sdc_deleted_at"] = deleted_at
+            yield record
+
+    def _save_dedup_indexes(self) -> None:
+        if self._dedup_index is not None:
+            # incremental syncs only read changed records, keep what wasn't seen
+            # again unless the whole table was read
+            self._dedup_index.save(merge=not self.index_removals)
+            self._dedup_index = None
+        for child_stream in self.child_streams:
+            child_stream._save_dedup_indexes()
+
+    def _write_record_message(self, record: dict) -> None:
+        index = self.dedup_index
+        # removed records are flagged once and forgotten, see _removed_records
+        if (
+            index is not None
+            and "_sdc_deleted_at" not in record
+            and not index.is_changed(record)
+        ):
+            return
+        record = self.record_conformer(record)
+        for stream_map in self.stream_maps:
+            mapped_record = stream_map.transform(record)
+            if mapped_record is not None:
+                self.output.write_record(stream_map.stream_alias, mapped_record)
+
+    def _write_schema_message(self) -> None:
+        # child streams are synced once per parent record, one SCHEMA is enough
+        if self._schema_written:
+            return
+        self._schema_written = True
+        for schema_message in self._generate_schema_messages():
+            self.output.write_message(schema_message.asdict())
+
+    @property
+    def backfill_enabled(self) -> bool:
+        """Return whether initial loads are split into time windows."""
+        return bool(
+            self.config.get("backfill_window_records")
+            and self.replication_key
+            and self.rep_key_field
+            and self.from_to
+        )
+
+    @property
+    def window_keys(self) -> Tuple[str, str]:
+        """Return the payload filters bounding a backfill window."""
+        return f"{self.rep_key_field}From", f"{self.rep_key_field}To"
+
+    def _is_window(self, context: Optional[dict]) -> bool:
+        if not context or not self.backfill_enabled:
+            return False
+        return self.window_keys[0] in context
+
+    def _window_context(self, start, end) -> dict:
+        window_from, window_to = self.window_keys
+        return {
+            window_from: start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            window_to: end.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }
+
+    @property
+    def base_partitions(self) -> Optional[List[dict]]:
+        """Return the partitions of the stream, without backfill windows."""
+        partitions = [
+            partition
+            for partition in super().partitions or []
+            if not self._is_window(partition)
+        ]
+        return partitions or None
+
+    @property
+    def partitions(self) -> Optional[List[dict]]:
+        plan = self.stream_state.get("backfill") if self.backfill_enabled else None
+        if plan:
+            return [
+                window["context"] for window in plan["windows"] if not window["done"]
+            ]
+        return self.base_partitions
+
+    def _window_is_full(self, context: dict, limit: int) -> bool:
+        """Return whether a window holds more than ``limit`` records."""
+
+        def probe() -> requests.Response:
+            # bypasses _send_page, a failed probe says nothing about the page size
+            prepared_request = self._prepare_page(context, limit, 1)
+            return self._request(prepared_request, context)
+
+        response = self.request_decorator(probe)()
+        return bool(get_records_counter(response))
+
+    def _plan_backfill(self) -> None:
+        """Split an initial load into time windows, synced as partitions.
+
+        The plan is kept in the stream state, so an interrupted backfill resumes
+        with the windows that did not finish.
+        """
+        state = self.stream_state
+        if "backfill" in state:
+            return
+        bookmarked = [state] + state.get("partitions", [])
+        if any(bookmark.get("replication_key_value") for bookmark in bookmarked):
+            return
+        start = self.get_starting_time(None)
+        end = datetime.datetime.now(AMSTERDAM_TZ)
+        limit = int(self.config["backfill_window_records"])
+        windows = []
+        for base in self.base_partitions or [{}]:
+
+            def is_full(window_start, window_end):
+                context = {**base, **self._window_context(window_start, window_end)}
+                return self._window_is_full(context, limit)
+
+            for window_start, window_end in plan_windows(start, end, is_full):
+                context = {**base, **self._window_context(window_start, window_end)}
+                windows.append({"context": context, "done": False})
+        self.logger.info(f"Backfilling '{self.name}' in {len(windows)} windows.")
+        state["backfill"] = {"end": end.isoformat(), "windows": windows}
+        self._write_state_message()
+
+    def _finish_window(self, context: dict) -> None:
+        for window in self.stream_state["backfill"]["windows"]:
+            if window["context"] == context:
+                window["done"] = True
+        # checkpoint, a resumed backfill skips this window
+        self._write_state_message()
+
+    def _finish_backfill(self) -> None:
+        """Replace the windows of a finished backfill with a regular bookmark."""
+        state = self.stream_state
+        plan = state.get("backfill")
+        if not plan or not all(window["done"] for window in plan["windows"]):
+            return
+        state["partitions"] = [
+            partition
+            for partition in state.get("partitions", [])
+            if not self._is_window(partition.get("context"))
+        ]
+        if not state["partitions"]:
+            del state["partitions"]
+        del state["backfill"]
+        unpartitioned: List[Optional[dict]] = [None]
+        for base in self.base_partitions or unpartitioned:
+            base_state = self.get_context_state(base)
+            base_state["replication_key"] = self.replication_key
+            base_state["replication_key_value"] = plan["end"]
+        self._write_state_message()
+
+    def _migrate_stream_bookmark(self) -> None:
+        """Move a bookmark of the whole stream into each of its partitions.
+
+        States written before the stream was partitioned keep the bookmark on the
+        stream, which the SDK ignores once it syncs partitions.
+        """
+        state = self.stream_state
+        if not state.get("replication_key_value") or not self.base_partitions:
+            return
+        for partition in self.base_partitions:
+            partition_state = self.get_context_state(partition)
+            if not partition_state.get("replication_key_value"):
+                partition_state["replication_key"] = state.get(
+                    "replication_key", self.replication_key
+                )
+                partition_state["replication_key_value"] = state[
+                    "replication_key_value"
+                ]
+        state.pop("replication_key", None)
+        state.pop("replication_key_value")
+
+    def _sync_records(self, context: Optional[dict] = None) -> None:
+        if self._page_sizer is None:
+            self._init_page_sizer()
+        if context is None:
+            self._migrate_stream_bookmark()
+        if context is None and self.backfill_enabled:
+            self._plan_backfill()
+            # a backfill may have finished right before the last run stopped
+            self._finish_backfill()
+        partitions = self.partitions if context is None else None
+        if partitions and len(partitions) > 1 and self.partition_concurrency > 1:
+            self._start_partition_workers(partitions)
+        try:
+            super()._sync_records(context)
+        finally:
+            self._partition_pages = []
+        if context is None and self.backfill_enabled:
+            self._finish_backfill()
+        if context is None:
+            self._finish_sync()
+
+    def _finish_sync(self) -> None:
+        """Wrap up the sync of a top-level stream and its children."""
+        # hand the batch files of this stream and its children to the target
+        self.output.close_batches(self._stream_names())
+        # only remember the records once they have been written
+        self._save_dedup_indexes()
+        self._write_request_counters()
+
+    def _start_partition_workers(self, partitions: list) -> None:
+        """Fetch the partitions in background threads, they are written in order."""
+        work: Queue = Queue()
+        for partition in partitions:
+            # create the partition state up front, workers only read it
+            self.get_context_state(partition)
+            # workers read the bookmark before the SDK gets to the partition
+            self._write_starting_replication_value(partition)
+            if self.checkpoint_enabled:
+                self._start_checkpoint(partition)
+            pages: Queue = Queue(maxsize=PARTITION_BUFFER_PAGES)
+            self._partition_pages.append((partition, pages))
+            work.put((partition, pages))
+        for _ in range(min(self.partition_concurrency, len(partitions))):
+            threading.Thread(
+                target=self._partition_worker,
+                args=(work,),
+                name=f"{self.name}-partition",
+                daemon=True,
+            ).start()
+
+    def _partition_worker(self, work: Queue) -> None:
+        while True:
+            try:
+                partition, pages = work.get_nowait()
+            except Empty:
+                return
+            try:
+                page: list = []
+                for record in self._fetch_records(copy.copy(partition)):
+                    page.append(record)
+                    if len(page) >= self.page_size:
+                        pages.put(page)
+                        page = []
+                pages.put(page)
+                pages.put(_PARTITION_DONE)
+            except Exception as ex:
+                pages.put(ex)
+
+    def _get_partition_pages(self, context: Optional[dict]) -> Optional[Queue]:
+        for partition, pages in self._partition_pages:
+            if partition == context:
+                return pages
+        return None
+
+    def _read_partition_pages(self, pages: Queue):
+        while True:
+            self.output.flush_if_due()
+            page = pages.get()
+            if page is _PARTITION_DONE:
+                return
+            if isinstance(page, Exception):
+                raise page
+            yield from page
+
+    def _fetch_batch(self, contexts: list, first_response=None) -> list:
+        """Return the processed records of each context, one list per context.
+
+        Streams with a multi-ID endpoint (``batch_path``) fetch the whole chunk with
+        one paginated request and split the records back by ``batch_key``; other
+        streams fall back to one request per context.
+        """
+        if self.batch_size <= 1:
+            return [list(self._fetch_records(copy.copy(c))) for c in contexts]
+
+        ids = [context[self.batch_key] for context in contexts]
+        batch_context = {self.batch_param: ids}
+        grouped: Dict[Any, list] = {id_: [] for id_ in ids}
+        contexts_by_id = dict(zip(ids, contexts))
+        prune = self.record_pruner
+        decorated_request = self.request_decorator(self._request)
+        next_page_token = None
+        while True:
+            if first_response is not None:
+                resp, first_response = first_response, None
+            else:
+                prepared_request = self.prepare_request(batch_context, next_page_token)
+                resp = decorated_request(prepared_request, batch_context)
+            for record in self.parse_response(resp):
+                key = record.get(self.batch_key)
+                if key not in grouped:
+                    self.logger.warning(
+                        f"Skipping '{self.name}' record for unrequested "
+                        f"{self.batch_key} {key}."
+                    )
                     continue
-                yield transformed_record
-    
-    
+                if prune is not None:
+                    record = prune(record)
+                transformed_record = self.post_process(record, contexts_by_id[key])
+                if transformed_record is not None:
+                    grouped[key].append(transformed_record)
+            counter = get_records_counter(resp)
+            # the server may cap TakeRecords, only an empty page is the last one
+            if not counter:
+                break
+            next_page_token = (next_page_token or 0) + counter
+        return [grouped[id_] for id_ in ids]
+
+    def _sync_children(self, child_context: dict) -> None:
+        child_streams = [
+            child_stream
+            for child_stream in self.child_streams
+            if child_stream.selected or child_stream.has_selected_descendents
+        ]
+        batch_size = max([s.batch_size for s in child_streams] or [1])
+        if self.child_concurrency <= 1 and batch_size <= 1:
+            return super()._sync_children(child_context)
+        if not child_streams:
+            return
+
+        self._child_batch.append(child_context)
+        if len(self._child_batch) >= batch_size:
+            self._submit_children()
+
+        # emit finished parents in order, and block once N fetches are in flight
+        while self._pending_children and (
+            self._pending_children[0][2].done()
+            or len(self._pending_children) > self.child_concurrency
+        ):
+            self._emit_children(*self._pending_children.popleft())
+
+    def _submit_children(self) -> None:
+        contexts, self._child_batch = self._child_batch, []
+        if not contexts:
+            return
+        child_streams = [
+            child_stream
+            for child_stream in self.child_streams
+            if child_stream.selected or child_stream.has_selected_descendents
+        ]
+        children: Union[AsyncChildren, "Future[list]"]
+        if self.async_transport:
+            children = AsyncChildren(child_streams, contexts)
+        elif self.child_concurrency > 1:
+            if self._child_executor is None:
+                self._child_executor = ThreadPoolExecutor(
+                    max_workers=self.child_concurrency,
+                    thread_name_prefix=f"{self.name}-children",
+                )
+            children = self._child_executor.submit(
+                self._fetch_children, child_streams, contexts
+            )
+        else:
+            fetched: "Future[list]" = Future()
+            fetched.set_result(self._fetch_children(child_streams, contexts))
+            children = fetched
+        self._pending_children.append((contexts, child_streams, children))
+
+    @staticmethod
+    def _fetch_children(child_streams: list, contexts: list) -> list:
+        return [child_stream._fetch_batch(contexts) for child_stream in child_streams]
+
+    def _emit_children(self, contexts: list, child_streams: list, children) -> None:
+        self.output.flush_if_due()
+        results = children.result()
+        for i, child_context in enumerate(contexts):
+            for child_stream, records in zip(child_streams, results):
+                child_stream._prefetched_records = records[i]
+                try:
+                    child_stream.sync(context=child_context)
+                finally:
+                    child_stream._prefetched_records = None
+
+    def _drain_children(self) -> None:
+        """Write out the children of every parent record still buffered or in flight."""
+        self._submit_children()
+        while self._pending_children:
+            self._emit_children(*self._pending_children.popleft())
+
     def _write_state_message(self) -> None:
         """Write out a STATE message with the latest state."""
+        # the bookmark may only move past a parent once its children are written
+        self._drain_children()
+        if self._page_sizer:
+            # partition workers only change the sizer, the state is written here
+            self.stream_state["page_size"] = self._page_sizer.size
         tap_state = self.tap_state
 
         if tap_state and tap_state.get("bookmarks"):
-            for stream_name in tap_state.get("bookmarks").keys():
+            # other streams may add bookmarks while this one writes its state
+            for stream_name in list(tap_state["bookmarks"]):
+                stream = self._tap.streams.get(stream_name)
+                if stream and not stream.parent_stream_type:
+                    # keep the partitions of top-level streams, e.g. products
+                    continue
                 if tap_state["bookmarks"][stream_name].get("partitions"):
                     tap_state["bookmarks"][stream_name] = {"partitions": []}
 
-        singer.write_message(StateMessage(value=tap_state))
+        self.output.write_state(tap_state)
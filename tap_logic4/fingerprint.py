@@ -0,0 +1,107 @@
+"""Local index of record fingerprints, used to only emit changed rows."""
+
+import hashlib
+import logging
+import os
+import struct
+from typing import Collection, Dict, Iterable, Iterator, Optional, Tuple, cast
+
+from tap_logic4.output import dumps
+
+_MAGIC = b"L4FP1\n"
+# one or two integer ids (e.g. ProductId, WarehouseId), 8 byte content hash
+_ENTRY = struct.Struct("<qq8s")
+
+Key = Tuple[int, ...]
+
+
+def fingerprint(record: dict, ignored: Collection[str] = ()) -> bytes:
+    """Return a short hash of a record's content, independent of key order."""
+    items = sorted(item for item in record.items() if item[0] not in ignored)
+    return hashlib.blake2b(dumps(items), digest_size=8).digest()
+
+
+class FingerprintIndex:
+    """Fingerprints of the records of previous syncs, keyed by one or two integer ids.
+
+    The index is kept in a binary file of fixed-size entries and replaced
+    atomically when it is saved. ``ignored`` properties (e.g. a synthetic
+    replication key) are not part of the fingerprint.
+    """
+
+    def __init__(
+        self, path: str, key_properties: Tuple[str, ...], ignored: Collection[str] = ()
+    ) -> None:
+        self.path = path
+        self.key_properties = key_properties
+        self.ignored = frozenset(ignored)
+        self.previous: Dict[Key, bytes] = {}
+        self.current: Dict[Key, bytes] = {}
+
+    def _key(self, record: dict) -> Optional[Key]:
+        key = tuple(record.get(name) for name in self.key_properties)
+        if all(isinstance(value, int) for value in key):
+            return cast(Key, key)
+        return None
+
+    def load(self, logger: Optional[logging.Logger] = None) -> None:
+        """Read the fingerprints of the previous sync, if there are any."""
+        self.previous = {}
+        self.current = {}
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as index_file:
+            data = index_file.read()
+        if not data.startswith(_MAGIC) or (len(data) - len(_MAGIC)) % _ENTRY.size:
+            if logger:
+                logger.warning(f"Ignoring unreadable fingerprint index '{self.path}'.")
+            return
+        size = len(self.key_properties)
+        header = len(_MAGIC)
+        self.previous = {
+            (first, second)[:size]: digest
+            for first, second, digest in _ENTRY.iter_unpack(data[header:])
+        }
+
+    def is_changed(self, record: dict) -> bool:
+        """Return whether a record is new or differs from the previous syncs."""
+        key = self._key(record)
+        if key is None:
+            return True
+        digest = fingerprint(record, self.ignored)
+        self.current[key] = digest
+        return self.previous.get(key) != digest
+
+    def changed(self, records: Iterable[dict]) -> Iterator[dict]:
+        """Yield the records that are new or differ from the previous sync."""
+        is_changed = self.is_changed
+        for record in records:
+            if is_changed(record):
+                yield record
+
+    def removed(self) -> Iterator[Key]:
+        """Return the keys of the previous sync that were not seen in this one."""
+        current = self.current
+        return (key for key in self.previous if key not in current)
+
+    def save(self, merge: bool = False) -> None:
+        """Replace the index file with the fingerprints of this sync.
+
+        With ``merge``, the fingerprints of previous syncs that were not seen
+        again are kept, as needed when a sync only reads the changed records.
+        """
+        if merge:
+            self.previous.update(self.current)
+        else:
+            self.previous = self.current
+        self.current = {}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as index_file:
+            index_file.write(_MAGIC)
+            index_file.write(
+                b"".join(
+                    _ENTRY.pack(*(key + (0,))[:2], digest)
+                    for key, digest in self.previous.items()
+                )
+            )
+        os.replace(tmp_path, self.path)
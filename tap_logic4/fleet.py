@@ -0,0 +1,185 @@
+"""Run the tap for many Logic4 accounts in a process pool."""
+
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import re
+import sys
+import time
+import traceback
+from multiprocessing.context import BaseContext
+from typing import List, Mapping, Optional
+
+import click
+
+# imported before the pool starts, so forked workers don't pay for the SDK
+# imports and the stream schemas again. Conformers depend on the tenant's catalog
+# and config, each worker compiles its own.
+from tap_logic4.output import close_writer
+from tap_logic4.tap import TapLogic4
+
+LOGGER = logging.getLogger("tap-logic4-fleet")
+
+OUTPUT_FILE = "output.jsonl"
+LOG_FILE = "tap.log"
+STATE_FILE = "state.json"
+SUMMARY_FILE = "summary.json"
+SHARED_CONFIG_FILE = "fleet-config.json"
+
+_TENANT_NAME = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+def _write_json(path: str, value) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as outfile:
+        json.dump(value, outfile, indent=2)
+    os.replace(tmp_path, path)
+
+
+def run_tenant(
+    tenant: Mapping,
+    output_dir: str,
+    shared_config: Optional[str],
+    catalog: Optional[str],
+) -> dict:
+    """Sync one tenant in the current process and return its report.
+
+    Singer messages go to ``<output_dir>/<name>/output.jsonl`` and the logs to
+    ``tap.log`` next to it. The last STATE is saved to the tenant's state file,
+    which is also the input state of the next run.
+    """
+    name = tenant["name"]
+    directory = os.path.join(output_dir, name)
+    os.makedirs(directory, exist_ok=True)
+    state_path = tenant.get("state") or os.path.join(directory, STATE_FILE)
+    config = [tenant["config"]] + ([shared_config] if shared_config else [])
+    report = {"tenant": name, "status": "succeeded", "error": None}
+    start = time.monotonic()
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    with open(os.path.join(directory, OUTPUT_FILE), "wb") as output, open(
+        os.path.join(directory, LOG_FILE), "ab"
+    ) as log:
+        # the worker only runs this tenant, point its stdout and stderr at the files
+        os.dup2(output.fileno(), 1)
+        os.dup2(log.fileno(), 2)
+        try:
+            tap = TapLogic4(
+                config=config,
+                catalog=tenant.get("catalog") or catalog,
+                state=state_path if os.path.exists(state_path) else None,
+            )
+            tap.sync_all()
+        except Exception as ex:
+            sys.stderr.flush()
+            log.write(traceback.format_exc().encode("utf-8"))
+            log.flush()
+            report["status"] = "failed"
+            # the full traceback is in the tenant's log
+            message = str(ex).splitlines()[0] if str(ex) else ""
+            report["error"] = f"{type(ex).__name__}: {message}"
+        writer = close_writer()
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+    report["seconds"] = round(time.monotonic() - start, 3)
+    report["records"] = dict(writer.record_counts) if writer else {}
+    state = writer.last_state if writer else None
+    if state is not None:
+        _write_json(state_path, state)
+    report["state"] = state_path if os.path.exists(state_path) else None
+    return report
+
+
+def _run_tenant(args: tuple) -> dict:
+    return run_tenant(*args)
+
+
+def run_fleet(
+    tenants: List[Mapping],
+    output_dir: str,
+    processes: int,
+    config: Optional[Mapping] = None,
+    catalog: Optional[str] = None,
+) -> dict:
+    """Sync every tenant in its own worker process, ``processes`` at a time.
+
+    Each worker syncs one tenant and exits, so tokens, sessions and the request
+    rate limit are never shared between accounts. ``config`` holds settings
+    applied to every tenant on top of its own config file, e.g. its
+    ``stream_concurrency`` and ``max_requests_per_second``. A summary of all
+    tenants is written to ``<output_dir>/summary.json`` and returned.
+    """
+    names = [tenant["name"] for tenant in tenants]
+    for name in names:
+        if not _TENANT_NAME.match(name):
+            raise ValueError(f"Tenant name '{name}' can't be used as a directory name.")
+    if len(set(names)) != len(names):
+        raise ValueError("Tenant names must be unique.")
+
+    os.makedirs(output_dir, exist_ok=True)
+    shared_config = None
+    if config:
+        shared_config = os.path.join(output_dir, SHARED_CONFIG_FILE)
+        _write_json(shared_config, dict(config))
+
+    started_at = datetime.datetime.now(datetime.timezone.utc)
+    context: BaseContext
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+    reports = []
+    with context.Pool(processes, maxtasksperchild=1) as pool:
+        work = [(tenant, output_dir, shared_config, catalog) for tenant in tenants]
+        for report in pool.imap_unordered(_run_tenant, work):
+            LOGGER.info(
+                f"Tenant '{report['tenant']}' {report['status']} in "
+                f"{report['seconds']}s, {sum(report['records'].values())} records."
+            )
+            reports.append(report)
+    reports.sort(key=lambda report: names.index(report["tenant"]))
+
+    summary = {
+        "started_at": started_at.isoformat(),
+        "finished_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "succeeded": sum(1 for report in reports if report["status"] == "succeeded"),
+        "failed": sum(1 for report in reports if report["status"] == "failed"),
+        "tenants": reports,
+    }
+    _write_json(os.path.join(output_dir, SUMMARY_FILE), summary)
+    return summary
+
+
+@click.command()
+@click.argument("fleet_file", type=click.Path(exists=True, dir_okay=False))
+@click.option("--output-dir", help="Directory of the tenant outputs and the summary.")
+@click.option(
+    "--processes", type=int, help="Number of tenants synced at the same time."
+)
+def cli(fleet_file: str, output_dir: Optional[str], processes: Optional[int]) -> None:
+    """Sync all tenants of FLEET_FILE, a JSON file like
+
+    {"output_dir": "out", "processes": 4, "catalog": "catalog.json",
+    "config": {"stream_concurrency": 2}, "tenants": [{"name": "acme",
+    "config": "acme.json"}]}
+    """
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    with open(fleet_file) as infile:
+        fleet = json.load(infile)
+    summary = run_fleet(
+        fleet["tenants"],
+        output_dir or fleet.get("output_dir") or "fleet-output",
+        processes or int(fleet.get("processes") or os.cpu_count() or 1),
+        fleet.get("config"),
+        fleet.get("catalog"),
+    )
+    if summary["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
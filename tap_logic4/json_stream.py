@@ -0,0 +1,120 @@
+"""Incremental parsing of Logic4 page responses."""
+
+import codecs
+import json
+from typing import Any, Iterable, Iterator
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+class _ChunkReader:
+    """Text buffer over a chunked body that only holds the unparsed tail."""
+
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Append the next chunk to the buffer, return False at the end of the body."""
+        if self.eof:
+            return False
+        pos = self.pos
+        self.buf = self.buf[pos:]
+        self.pos = 0
+        for chunk in self._chunks:
+            if chunk:
+                self.buf += self._utf8.decode(chunk)
+                return True
+        self.buf += self._utf8.decode(b"", final=True)
+        self.eof = True
+        return False
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, chars: str) -> str:
+        """Consume the next character, which must be one of ``chars``."""
+        char = self.peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(
+                f"Expecting one of {chars!r}", self.buf, self.pos
+            )
+        self.pos += 1
+        return char
+
+    def value(self) -> Any:
+        """Decode the next JSON value, reading more chunks until it is complete."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # a number or literal ending at the chunk boundary may continue
+            if end == len(self.buf) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def rest(self) -> Any:
+        """Decode everything that is left of the body as one JSON value."""
+        while self.fill():
+            pass
+        pos = self.pos
+        return json.loads(self.buf[pos:])
+
+
+class RecordsReader:
+    """Yield the items of a page's ``Records`` array while the body downloads.
+
+    The other top-level keys (e.g. ``RecordsCounter``) are collected in
+    ``payload`` once the iteration finished. Bodies that are not JSON objects
+    are decoded as a whole into ``payload`` and yield no records.
+    """
+
+    def __init__(self, chunks: Iterable[bytes], records_key: str = "Records") -> None:
+        self._reader = _ChunkReader(chunks)
+        self.records_key = records_key
+        self.payload: Any = None
+
+    def __iter__(self) -> Iterator[Any]:
+        reader = self._reader
+        if reader.peek() != "{":
+            self.payload = reader.rest()
+            return
+
+        reader.pos += 1
+        payload: dict = {}
+        if reader.peek() == "}":
+            reader.pos += 1
+        else:
+            while True:
+                key = reader.value()
+                reader.expect(":")
+                if key == self.records_key and reader.peek() == "[":
+                    reader.pos += 1
+                    if reader.peek() == "]":
+                        reader.pos += 1
+                    else:
+                        while True:
+                            yield reader.value()
+                            if reader.expect(",]") == "]":
+                                break
+                else:
+                    payload[key] = reader.value()
+                if reader.expect(",}") == "}":
+                    break
+        self.payload = payload
@@ -0,0 +1,350 @@
+"""Buffered Singer message output."""
+
+import atexit
+import datetime
+import gzip
+import io
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Collection, Dict, List, Mapping, Optional
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+import simplejson
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None  # type: ignore[assignment]
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_BATCH_MAX_RECORDS = 1000000
+DEFAULT_BATCH_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_GZIP_LEVEL = 6
+
+_writer: Optional["MessageWriter"] = None
+_writer_lock = threading.Lock()
+
+
+def dumps(value: Any) -> bytes:
+    """Serialize a message value to compact JSON."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value)
+        except TypeError:
+            pass
+    try:
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
+    except (TypeError, ValueError):
+        # e.g. Decimal values, written like singer-python does
+        return simplejson.dumps(value, use_decimal=True).encode("utf-8")
+
+
+class BatchFile:
+    """Records of one stream spilled to a local JSONL or Parquet file."""
+
+    def __init__(self, stream: str, directory: str, prefix: str, encoding: Mapping):
+        self.format = encoding.get("format") or "jsonl"
+        self.compression = encoding.get("compression") or "gzip"
+        if self.format == "jsonl":
+            extension = "json.gz" if self.compression == "gzip" else "json"
+        elif self.format == "parquet":
+            if pyarrow is None:
+                raise RuntimeError(
+                    "Parquet batch files require pyarrow, "
+                    "install tap-logic4 with the 'parquet' extra."
+                )
+            extension = "parquet"
+        else:
+            raise ValueError(f"Unsupported batch file format '{self.format}'.")
+        name = f"{prefix}{stream}-{uuid.uuid4().hex}.{extension}"
+        self.path = os.path.abspath(os.path.join(directory, name))
+        self.records = 0
+        self.size = 0
+        self._rows: List[dict] = []
+        self._file: Optional[io.BufferedIOBase] = None
+        if self.format == "jsonl":
+            if self.compression == "gzip":
+                level = int(encoding.get("compression_level") or DEFAULT_GZIP_LEVEL)
+                self._file = gzip.open(self.path, "wb", compresslevel=level)
+            else:
+                self._file = open(self.path, "wb")
+
+    def write(self, record: dict) -> None:
+        if self._file is not None:
+            line = dumps(record) + b"\n"
+            self._file.write(line)
+            self.size += len(line)
+        else:
+            self._rows.append(record)
+            # the rows are only encoded on close, count their size as JSON so
+            # max_bytes means the same for both formats
+            self.size += len(dumps(record)) + 1
+        self.records += 1
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        else:
+            table = pyarrow.Table.from_pylist(self._rows)
+            compression = None if self.compression == "none" else self.compression
+            pyarrow.parquet.write_table(table, self.path, compression=compression)
+            self._rows = []
+
+    def message(self, stream: str) -> dict:
+        """Return the BATCH message pointing at the closed file."""
+        return {
+            "type": "BATCH",
+            "stream": stream,
+            "encoding": {"format": self.format, "compression": self.compression},
+            "manifest": [f"file://{self.path}"],
+        }
+
+
+class MessageWriter:
+    """Write Singer messages to stdout in large blocks.
+
+    RECORD messages are serialized into a buffer that is written out once it
+    holds ``buffer_size`` bytes or is ``flush_interval`` seconds old, other
+    messages go through the same buffer to keep their order. The buffer is always
+    written out with a STATE message, so a target never sees a bookmark before
+    the records it covers. All records of a block share the same
+    ``time_extracted``.
+
+    With a ``batch_config``, the records of the batched streams are written to
+    rotated local files instead and the target gets a BATCH message per file.
+    STATE messages are then held back until the files they cover are closed.
+
+    Streams synced at the same time (``concurrent``) share the writer, their
+    messages are then written under one lock.
+    """
+
+    def __init__(
+        self,
+        buffer_size: int,
+        flush_interval: float,
+        batch_config: Optional[Mapping] = None,
+        concurrent: bool = False,
+    ) -> None:
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._chunks: List[bytes] = []
+        self._size = 0
+        self._started = 0.0
+        self._block_thread: Optional[int] = None
+        self._suffix = b""
+        self._prefixes: Dict[str, bytes] = {}
+        self._last_state: Optional[bytes] = None
+        self.record_counts: Dict[str, int] = {}
+        self._pending_state: Optional[bytes] = None
+        self._batch_files: Dict[str, BatchFile] = {}
+        self._lock = threading.RLock()
+        self._concurrent = concurrent
+        self.batch_config = batch_config
+        if batch_config:
+            storage = batch_config.get("storage") or {}
+            root = urlparse(storage.get("root") or "file://.")
+            if root.scheme != "file":
+                raise ValueError("Batch files can only be written to a 'file://' root.")
+            self._batch_dir = url2pathname(root.netloc + root.path) or "."
+            self._batch_prefix = storage.get("prefix") or ""
+            os.makedirs(self._batch_dir, exist_ok=True)
+            streams = batch_config.get("streams")
+            self._batch_streams = set(streams) if streams else None
+            self._batch_max_records = int(
+                batch_config.get("max_records") or DEFAULT_BATCH_MAX_RECORDS
+            )
+            self._batch_max_bytes = int(
+                batch_config.get("max_bytes") or DEFAULT_BATCH_MAX_BYTES
+            )
+
+    def is_batched(self, stream: str) -> bool:
+        """Return whether the records of a stream are written to batch files."""
+        return bool(self.batch_config) and (
+            self._batch_streams is None or stream in self._batch_streams
+        )
+
+    def _prefix(self, stream: str) -> bytes:
+        prefix = self._prefixes.get(stream)
+        if prefix is None:
+            prefix = b'{"type":"RECORD","stream":' + dumps(stream) + b',"record":'
+            self._prefixes[stream] = prefix
+        return prefix
+
+    def _start_block(self) -> None:
+        self._started = time.monotonic()
+        self._block_thread = threading.get_ident()
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self._suffix = (
+            b',"time_extracted":"'
+            + now.strftime("%Y-%m-%dT%H:%M:%S.%fZ").encode("ascii")
+            + b'"}\n'
+        )
+
+    def _append(self, line: bytes) -> None:
+        if not self._chunks:
+            self._start_block()
+        self._chunks.append(line)
+        self._size += len(line)
+        if (
+            self._size >= self.buffer_size
+            or time.monotonic() - self._started >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush_if_due(self) -> None:
+        """Write the buffered messages out if they are ``flush_interval`` seconds old.
+
+        Called before a stream waits for the API, so records don't sit in the buffer
+        while no new ones arrive. Without ``concurrent``, records are buffered
+        without the lock, so only the thread writing them may flush.
+        """
+        if not self._chunks or time.monotonic() - self._started < self.flush_interval:
+            return
+        if self._concurrent or self._block_thread == threading.get_ident():
+            self.flush()
+
+    def write_message(self, message: Mapping) -> None:
+        """Buffer any other message, e.g. SCHEMA."""
+        line = dumps(message) + b"\n"
+        with self._lock:
+            self._append(line)
+
+    def write_record(self, stream: str, record: dict) -> None:
+        """Buffer a RECORD message, or spill the record to the stream's batch file."""
+        if self._concurrent:
+            # a lock per record costs as much as serializing it, so only when needed
+            with self._lock:
+                self._write_record(stream, record)
+        else:
+            self._write_record(stream, record)
+
+    def _write_record(self, stream: str, record: dict) -> None:
+        self.record_counts[stream] = self.record_counts.get(stream, 0) + 1
+        if self.batch_config and self.is_batched(stream):
+            self._write_batch_record(stream, record)
+            return
+        if not self._chunks:
+            self._start_block()
+        self._append(self._prefix(stream) + dumps(record) + self._suffix)
+
+    def _write_batch_record(self, stream: str, record: dict) -> None:
+        batch_file = self._batch_files.get(stream)
+        if batch_file is None:
+            encoding = (self.batch_config or {}).get("encoding") or {}
+            batch_file = BatchFile(
+                stream, self._batch_dir, self._batch_prefix, encoding
+            )
+            self._batch_files[stream] = batch_file
+        batch_file.write(record)
+        if (
+            batch_file.records >= self._batch_max_records
+            or batch_file.size >= self._batch_max_bytes
+        ):
+            self._close_batch_file(stream)
+            if not self._batch_files:
+                self._write_pending_state()
+
+    def _close_batch_file(self, stream: str) -> None:
+        batch_file = self._batch_files.pop(stream)
+        batch_file.close()
+        self._chunks.append(dumps(batch_file.message(stream)) + b"\n")
+        self.flush()
+
+    def _write_pending_state(self) -> None:
+        if self._pending_state is not None:
+            self._chunks.append(self._pending_state)
+            self._pending_state = None
+            self.flush()
+
+    def close_batches(self, streams: Optional[Collection[str]] = None) -> None:
+        """Close the open batch files, then write the STATE they held back.
+
+        ``streams`` limits this to the files of some streams, the STATE is then
+        only written if no other file is still open.
+        """
+        with self._lock:
+            for stream in list(self._batch_files):
+                if streams is None or stream in streams:
+                    self._close_batch_file(stream)
+            if not self._batch_files:
+                self._write_pending_state()
+            self.flush()
+
+    @property
+    def last_state(self) -> Optional[dict]:
+        """Return the value of the last STATE message."""
+        if self._last_state is None:
+            return None
+        return json.loads(self._last_state)["value"]
+
+    def write_state(self, value: Mapping) -> None:
+        """Write the buffered records and a STATE message, unless it is unchanged."""
+        with self._lock:
+            line = b'{"type":"STATE","value":' + dumps(value) + b"}\n"
+            if line == self._last_state and not self._chunks:
+                return
+            self._last_state = line
+            if self._batch_files:
+                # the bookmark may only move once the target has the files it covers
+                self._pending_state = line
+                return
+            self._chunks.append(line)
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered messages to stdout."""
+        with self._lock:
+            data = b"".join(self._chunks)
+            self._chunks = []
+            self._size = 0
+            if not data:
+                return
+            out = sys.stdout
+            buffer = getattr(out, "buffer", None)
+            if buffer is not None:
+                # messages written through sys.stdout (e.g. SCHEMA) must come first
+                out.flush()
+                buffer.write(data)
+                buffer.flush()
+            else:
+                out.write(data.decode("utf-8"))
+                out.flush()
+
+
+def get_writer(config: Mapping) -> MessageWriter:
+    """Return the process-wide message writer."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                buffer_size = config.get("output_buffer_size")
+                flush_interval = config.get("output_flush_interval")
+                _writer = MessageWriter(
+                    DEFAULT_BUFFER_SIZE if buffer_size is None else int(buffer_size),
+                    DEFAULT_FLUSH_INTERVAL
+                    if flush_interval is None
+                    else float(flush_interval),
+                    config.get("batch_config"),
+                    int(config.get("stream_concurrency") or 1) > 1,
+                )
+                atexit.register(_writer.close_batches)
+    return _writer
+
+
+def close_writer() -> Optional[MessageWriter]:
+    """Close the batch files of the process-wide writer, if any, and return it."""
+    if _writer is not None:
+        _writer.close_batches()
+    return _writer
@@ -0,0 +1,109 @@
+"""Page size control for Logic4 offset pagination."""
+
+import threading
+from typing import NamedTuple, Optional
+
+MIN_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 10000
+# don't grow pages past this body size, whatever the latency
+MAX_PAGE_BYTES = 32 * 1024 * 1024
+
+
+class AdaptivePageSize:
+    """Pick the TakeRecords of the next page from the latency of the last ones.
+
+    The size grows by half while pages come back in under half the latency target,
+    and halves when a page is slower than the target, times out or fails with a
+    5xx error. Offsets are always advanced by the records actually returned, so the
+    size can change between any two pages.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        latency_target: float,
+        minimum: int = MIN_PAGE_SIZE,
+        maximum: int = MAX_PAGE_SIZE,
+    ) -> None:
+        self.minimum = min(minimum, initial)
+        self.maximum = max(maximum, initial)
+        self.latency_target = latency_target
+        self.size = self._clamp(initial)
+        self.bytes_per_record: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _clamp(self, size: float) -> int:
+        return int(min(max(size, self.minimum), self.maximum))
+
+    def record(self, take: int, records: int, elapsed: float, nbytes: int) -> bool:
+        """Account for a finished page, return whether the size changed."""
+        with self._lock:
+            if records and nbytes:
+                self.bytes_per_record = nbytes / records
+            size: float = self.size
+            if elapsed > self.latency_target:
+                size = take / 2
+            elif elapsed < self.latency_target / 2 and records >= take:
+                # only grow on full pages, short pages say nothing about the limit
+                size = take * 1.5
+                if self.bytes_per_record:
+                    size = min(size, MAX_PAGE_BYTES / self.bytes_per_record)
+                size = max(size, self.size)
+            return self._set(size)
+
+    def failed(self, take: int) -> bool:
+        """Account for a timed out or failed page, return whether the size changed."""
+        with self._lock:
+            return self._set(min(take, self.size) / 2)
+
+    def _set(self, size: float) -> bool:
+        size = self._clamp(size)
+        changed = size != self.size
+        self.size = size
+        return changed
+
+
+class KeysetToken(NamedTuple):
+    """Next page of a keyset scan: records from ``value`` on, minus ``skip`` read.
+
+    ``value`` is the lowest key of the next page (None for the start filter) and
+    ``skip`` the number of records with that key that were already read. Once
+    ``ordered`` is False the scan continues with plain offsets from ``value``.
+    """
+
+    value: Optional[str]
+    skip: int
+    ordered: bool = True
+
+
+class KeysetPage:
+    """Keys of the records of one page, in the order they were returned."""
+
+    def __init__(self) -> None:
+        self.last: Optional[str] = None
+        self.trailing = 0
+        self.ordered = True
+
+    def add(self, value: Optional[str]) -> None:
+        if value is None or (self.last is not None and value < self.last):
+            self.ordered = False
+        if value == self.last:
+            self.trailing += 1
+        else:
+            self.last = value
+            self.trailing = 1
+
+    def next_token(self, previous: Optional[KeysetToken], counter: int) -> KeysetToken:
+        """Return the token of the page after this one."""
+        if previous is not None and not previous.ordered:
+            return previous._replace(skip=previous.skip + counter)
+        if not self.ordered:
+            # the endpoint doesn't sort by the key, keep the filter and use offsets
+            value = previous.value if previous else None
+            skip = (previous.skip if previous else 0) + counter
+            return KeysetToken(value, skip, False)
+        skip = self.trailing
+        if previous is not None and self.last == previous.value:
+            # the whole page had the key of the previous one
+            skip += previous.skip
+        return KeysetToken(self.last, skip)
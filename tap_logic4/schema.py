@@ -0,0 +1,306 @@
+"""Record conforming compiled from the stream schemas."""
+
+import datetime
+import logging
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+)
+
+import pendulum
+
+Converter = Callable[[Any], Any]
+
+# values of these types are already JSON compatible
+_JSON_TYPES = (str, int, float, bool, type(None), list, dict)
+_EPOCH = datetime.datetime.utcfromtimestamp(0)
+
+
+def schema_types(schema: Mapping) -> Set[str]:
+    """Return the JSON types a (possibly ``anyOf``) property schema allows."""
+    types: Set[str] = set()
+    for sub_schema in schema.get("anyOf", [schema]):
+        type_ = sub_schema.get("type", [])
+        types.update([type_] if isinstance(type_, str) else type_)
+    return types
+
+
+def to_json_value(value: Any) -> Any:
+    """Convert python date, time and bytes values like the SDK does."""
+    if isinstance(value, datetime.datetime):
+        return pendulum.instance(value).isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat() + "T00:00:00+00:00"
+    if isinstance(value, datetime.timedelta):
+        return (_EPOCH + value).isoformat() + "+00:00"
+    if isinstance(value, datetime.time):
+        return str(value)
+    if isinstance(value, bytes):
+        return value.hex()
+    return value
+
+
+def _to_boolean(value: Any) -> Optional[bool]:
+    if value is None or value is True or value is False:
+        return value
+    if isinstance(value, bytes):
+        return value != b"\x00"
+    return value != 0
+
+
+def _to_integer(value: Any) -> Any:
+    if type(value) is int or value is None:
+        return value
+    if type(value) is float and value.is_integer():
+        return int(value)
+    if type(value) is str:
+        try:
+            return int(value)
+        except ValueError:
+            try:
+                number = float(value)
+            except ValueError:
+                return value
+            return int(number) if number.is_integer() else number
+    return to_json_value(value)
+
+
+def _to_number(value: Any) -> Any:
+    if type(value) in (int, float) or value is None:
+        return value
+    if type(value) is str:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    return to_json_value(value)
+
+
+def _plain(value: Any) -> Any:
+    if type(value) in _JSON_TYPES:
+        return value
+    return to_json_value(value)
+
+
+def _compile_property(
+    schema: Mapping, mask: Mapping, breadcrumb: Tuple[str, ...]
+) -> Converter:
+    types = schema_types(schema)
+    if "boolean" in types:
+        return _to_boolean
+    if "integer" in types:
+        return _to_integer
+    if "number" in types:
+        return _to_number
+    if "object" in types and schema.get("properties"):
+        return _compile_nested(schema, mask, breadcrumb)
+    if "array" in types and isinstance(schema.get("items"), Mapping):
+        item = _compile_property(schema["items"], {}, ())
+        if item is _plain:
+            return _plain
+
+        def convert_array(value: Any) -> Any:
+            if type(value) is list:
+                return [item(element) for element in value]
+            return _plain(value)
+
+        return convert_array
+    return _plain
+
+
+def _compile_fields(
+    schema: Mapping, mask: Mapping, breadcrumb: Tuple[str, ...]
+) -> Tuple[Dict[str, Converter], Set[str]]:
+    """Return the converters of the selected properties and the deselected names."""
+    fields: Dict[str, Converter] = {}
+    deselected: Set[str] = set()
+    for name, property_schema in (schema.get("properties") or {}).items():
+        property_breadcrumb = breadcrumb + ("properties", name)
+        if mask and not mask[property_breadcrumb]:
+            deselected.add(name)
+            continue
+        fields[name] = _compile_property(property_schema, mask, property_breadcrumb)
+    return fields, deselected
+
+
+def _compile_nested(
+    schema: Mapping, mask: Mapping, breadcrumb: Tuple[str, ...]
+) -> Converter:
+    fields, deselected = _compile_fields(schema, mask, breadcrumb)
+
+    def convert_object(value: Any) -> Any:
+        if type(value) is not dict:
+            return _plain(value)
+        result = {}
+        for key, element in value.items():
+            convert = fields.get(key)
+            if convert is not None:
+                result[key] = convert(element)
+            elif key not in deselected:
+                # keys missing from a nested schema are kept, as the SDK does
+                result[key] = element
+        return result
+
+    return convert_object
+
+
+def _object_pruner(deselected: Set[str], nested: Dict[str, Callable]) -> Callable:
+    # nested keys missing from the schema are kept, as the SDK does
+    def prune_object(value: dict) -> dict:
+        result = {}
+        for key, element in value.items():
+            if key in deselected:
+                continue
+            prune_nested = nested.get(key)
+            if prune_nested is not None and type(element) is dict:
+                element = prune_nested(element)
+            result[key] = element
+        return result
+
+    return prune_object
+
+
+def _warn_unknown_property(logger: logging.Logger, stream_name: str, key: str) -> None:
+    logger.warning(
+        f"Property '{key}' was present in the '{stream_name}' stream but "
+        "not found in catalog schema. Ignoring."
+    )
+
+
+def _unknown_checker(
+    known: Set[str], stream_name: str, logger: Optional[logging.Logger]
+) -> Callable[[dict], None]:
+    """Return a function warning once per top-level key a record has off the schema.
+
+    The pruner drops those keys before the conformer could warn about them.
+    """
+
+    def check(record: dict) -> None:
+        if record.keys() <= known:
+            return
+        for key in record.keys() - known:
+            known.add(key)
+            if logger is not None:
+                _warn_unknown_property(logger, stream_name, key)
+
+    return check
+
+
+def _record_pruner(
+    selected: List[str], nested: Dict[str, Callable], check: Callable[[dict], None]
+) -> Callable:
+    if not nested:
+
+        def prune_flat(record: dict) -> dict:
+            check(record)
+            return {key: record[key] for key in selected if key in record}
+
+        return prune_flat
+
+    def prune_record(record: dict) -> dict:
+        check(record)
+        result = {}
+        for key in selected:
+            if key in record:
+                value = record[key]
+                prune_nested = nested.get(key)
+                if prune_nested is not None and type(value) is dict:
+                    value = prune_nested(value)
+                result[key] = value
+        return result
+
+    return prune_record
+
+
+def _compile_pruner(
+    schema: Mapping,
+    mask: Mapping,
+    breadcrumb: Tuple[str, ...],
+    keep: Iterable[str],
+    check: Callable[[dict], None],
+) -> Optional[Callable[[dict], dict]]:
+    selected = []
+    deselected = set()
+    nested = {}
+    for name, property_schema in (schema.get("properties") or {}).items():
+        property_breadcrumb = breadcrumb + ("properties", name)
+        if name not in keep and not mask[property_breadcrumb]:
+            deselected.add(name)
+            continue
+        selected.append(name)
+        if "object" in schema_types(property_schema):
+            prune_nested = _compile_pruner(
+                property_schema, mask, property_breadcrumb, (), check
+            )
+            if prune_nested is not None:
+                nested[name] = prune_nested
+    if not deselected and not nested:
+        return None
+    if breadcrumb:
+        return _object_pruner(deselected, nested)
+    return _record_pruner(selected, nested, check)
+
+
+def compile_pruner(
+    schema: Mapping,
+    mask: Mapping,
+    keep: Iterable[str] = (),
+    stream_name: str = "",
+    logger: Optional[logging.Logger] = None,
+    dropped: Iterable[str] = (),
+) -> Optional[Callable[[dict], dict]]:
+    """Compile a selection mask into a function that drops deselected properties.
+
+    The function returns a new record with only the selected top-level
+    properties (in schema order), deselected properties of nested objects are
+    dropped as well. The ``keep`` properties are never dropped. Top-level
+    properties that are not in the schema are dropped with the conformer's
+    warning, once per property name, except for the ``dropped`` ones. Returns
+    None when nothing is deselected, or when the whole stream is deselected (it
+    is then only synced for its children).
+    """
+    if not mask or not mask[()]:
+        return None
+    known = set(schema.get("properties") or ()).union(dropped)
+    check = _unknown_checker(known, stream_name, logger)
+    return _compile_pruner(schema, mask, (), tuple(keep), check)
+
+
+def compile_conformer(
+    stream_name: str,
+    schema: Mapping,
+    mask: Mapping,
+    logger: logging.Logger,
+    dropped: Iterable[str] = (),
+) -> Callable[[dict], dict]:
+    """Compile a stream schema and selection mask into one record conforming function.
+
+    The function drops deselected properties (also inside nested objects),
+    coerces integer, number and boolean values and converts python date and time
+    values to strings. Top-level properties that are not in the schema are
+    dropped with a warning, once per property name, except for the ``dropped``
+    ones.
+    """
+    fields, deselected = _compile_fields(schema, mask, ())
+    deselected.update(dropped)
+    warned: Set[str] = set()
+
+    def conform(record: dict) -> dict:
+        result = {}
+        for key, value in record.items():
+            convert = fields.get(key)
+            if convert is not None:
+                result[key] = convert(value)
+            elif key not in deselected and key not in warned:
+                warned.add(key)
+                _warn_unknown_property(logger, stream_name, key)
+        return result
+
+    return conform
@@ -1,10 +1,11 @@
 """Stream type classes for tap-logic4."""
 
+import datetime
+from typing import Optional
+
 from singer_sdk import typing as th
 
-from tap_logic4.client import Logic4Stream
-import datetime 
-import pytz
+from tap_logic4.client import AMSTERDAM_TZ, Logic4Stream
 
 address_type = th.ObjectType(
     th.Property(
@@ -194,57 +195,34 @@ class ProductsStream(Logic4Stream):
         th.Property("IsVisibleInLogic4", th.BooleanType),
     ).to_dict()
     
-    # we need to go over each pair of IsVisibleOnWebShop and IsVisibleInLogic4
+    # we need to go over each pair of IsVisibleOnWebShop and IsVisibleInLogic4,
+    # every pair is a partition with its own offset and bookmark
     is_visible_pairs = [
         {"IsVisibleOnWebShop": True, "IsVisibleInLogic4": True},
         {"IsVisibleOnWebShop": False, "IsVisibleInLogic4": True},
         {"IsVisibleOnWebShop": True, "IsVisibleInLogic4": False},
         {"IsVisibleOnWebShop": False, "IsVisibleInLogic4": False},
     ]
-    is_visible_current_pair = None
-    
+
+    @property
+    def base_partitions(self):
+        """Return a partition per IsVisibleOnWebShop/IsVisibleInLogic4 pair."""
+        return [dict(pair) for pair in self.is_visible_pairs]
+
     def prepare_request_payload(self, context, next_page_token):
-        payload = super().prepare_request_payload(context, None)
-        if next_page_token and next_page_token.get("counter"):
-            payload["SkipRecords"] = next_page_token.get("counter")
-        
-        # we need to change the pairs if is the first attempt or the response doesn't have any record (counter=0)
-        if (len(self.is_visible_pairs) == 4) or (next_page_token and next_page_token.get("counter") == 0):
-            if self.is_visible_pairs:
-                self.is_visible_current_pair = self.is_visible_pairs.pop()
-            else:
-                self.is_visible_current_pair = None
-        if self.is_visible_current_pair:
-            payload.update(self.is_visible_current_pair)
-            context.update(self.is_visible_current_pair)
+        payload = super().prepare_request_payload(context, next_page_token)
+        # window and keyset filters are already set
+        for key, value in (context or {}).items():
+            payload.setdefault(key, value)
         return payload
 
     def get_child_context(self, record: dict, context) -> dict:
         return {"ProductId": record["ProductId"]}
-    
-    def get_next_page_token(self, response, previous_token):
-        counter = response.json().get("RecordsCounter")
-        if counter == 0 and len(self.is_visible_pairs) == 0:
-            return None  # this means we go through all the pages through all the pairs
-        
-        next_page_token = {"counter": 0}
-        if counter:
-            prev_token = previous_token.get("counter", 0) if previous_token else 0
-            next_page_token["counter"] = prev_token + counter
-        if self.is_visible_current_pair:
-            next_page_token.update(self.is_visible_current_pair)
-        
-        return next_page_token
-    
+
     def post_process(self, row, context):
-        row = super().post_process(row, context)
-        row.update(context)
+        if context:
+            row.update(context)
         return row
-    
-    def _get_state_partition_context(self, context):
-        if context == self.is_visible_current_pair:
-            return None
-        return super()._get_state_partition_context(context)
 
 
 class SupplierProductBulkStream(Logic4Stream):
@@ -275,6 +253,10 @@ class SupplierProductStream(Logic4Stream):
     path = "/v1.1/Products/GetSuppliersForProduct"
     primary_keys = ["CreditorProductCode"]
     parent_stream_type = ProductsStream
+    offset_paginated = False
+    batch_path = "/v1.1/Products/GetSuppliersForProducts"
+    batch_key = "ProductId"
+    batch_param = "ProductIds"
 
     schema = th.PropertiesList(
         th.Property("ProductId", th.IntegerType),
@@ -291,6 +273,8 @@ class SupplierProductStream(Logic4Stream):
     ).to_dict()
 
     def prepare_request_payload(self, context, next_page_token):
+        if self.batch_param in context:
+            return super().prepare_request_payload(context, next_page_token)
         return context["ProductId"]
     
     def get_next_page_token(self, response, previous_token):
@@ -302,7 +286,12 @@ class StockStream(Logic4Stream):
 
     name = "stocks"
     path = "/v1.1/Stock/GetStockForWarehouses"
-    primary_keys = ["ProductId"]
+    # a product has a stock row per warehouse
+    primary_keys = ["ProductId", "WarehouseId"]
+    # NOTE: the endpoint has no change filter, with a dedup_index_dir only rows
+    # that changed since the last sync are emitted, removed rows are flagged
+    index_keys = ("ProductId", "WarehouseId")
+    index_removals = True
     schema = th.PropertiesList(
         th.Property("ProductCode", th.StringType),
         th.Property("WarehouseId", th.IntegerType),
@@ -310,6 +299,7 @@ class StockStream(Logic4Stream):
         th.Property("FreeStock", th.NumberType),
         th.Property("ProductId", th.IntegerType),
         th.Property("Qty", th.NumberType),
+        th.Property("_sdc_deleted_at", th.DateTimeType),
     ).to_dict()
 
 
@@ -320,6 +310,9 @@ class TransactionBaseStream(Logic4Stream):
     replication_key = "ChangedAt"
     rep_key_field = "ChangedAfter" # filter param provided by logic4
     from_to = False
+    index_keys = ("Id",)
+    index_ignored = ("ChangedAt",)
+    _window_end: Optional[str] = None
 
     schema = th.PropertiesList(
         th.Property("DebtorId", th.IntegerType),
@@ -493,12 +486,21 @@ class TransactionBaseStream(Logic4Stream):
         ),
     ).to_dict()
 
+    def _sync_records(self, context: Optional[dict] = None) -> None:
+        # every record gets the time the sync started as ChangedAt, see post_process.
+        # Later changes are picked up by the next sync, so the bookmark is a safe
+        # high-water mark of the ChangedAfter window that was queried
+        self._window_end = self._changed_at_now()
+        super()._sync_records(context)
+
+    @staticmethod
+    def _changed_at_now():
+        return datetime.datetime.now(AMSTERDAM_TZ).isoformat(timespec="microseconds")
+
     def post_process(self, row, context):
-        row = super().post_process(row, context)
         # NOTE: while orders and invoices support a ChangedAfter filter, the tap needs a datetime value for the rep_key field 
         # in each record, as logic4 doesn't return any updated time value we're synthetically creating ChangedAt to use as rep_key
-        now = datetime.datetime.now(pytz.timezone('Europe/Amsterdam')).strftime("%Y-%m-%dT%H:%M:%S.%f")
-        row["ChangedAt"] = now
+        row["ChangedAt"] = self._window_end or self._changed_at_now()
         return row
 
 
@@ -520,6 +522,8 @@ class OrderRowsStream(Logic4Stream):
     path = "/v1/Orders/GetOrderRows"
     primary_keys = ["Id"]
     parent_stream_type = OrdersStream
+    offset_paginated = False
+    index_keys = ("Id",)
     schema = th.PropertiesList(
         th.Property("SerialNumbers", th.ArrayType(th.StringType)),
         th.Property("ExpectedNextQtyOnDelivery", th.NumberType),
@@ -596,6 +600,8 @@ class InvoiceRowsStream(Logic4Stream):
     path = "/v1/Orders/GetInvoiceRows"
     primary_keys = ["Id"]
     parent_stream_type = InvoicesStream
+    offset_paginated = False
+    index_keys = ("Id",)
     schema = th.PropertiesList(
         th.Property("SerialNumbers", th.ArrayType(th.StringType)),
         th.Property("ExpectedNextQtyOnDelivery", th.NumberType),
@@ -662,6 +668,7 @@ class BuyOrdersStream(Logic4Stream):
     path = "/v1.1/BuyOrders/GetBuyOrders"
     primary_keys = ["Id"]
     rep_key_field = "BuyOrderDate"
+    required_properties = ("BuyOrderClosed",)
 
     schema = th.PropertiesList(
         th.Property("AmountOfRows", th.NumberType),
@@ -701,6 +708,7 @@ class BuyOrdersRowsStream(Logic4Stream):
     path = "/v1/BuyOrders/GetBuyOrderRows"
     primary_keys = ["BuyOrderRowId"]
     parent_stream_type = BuyOrdersStream
+    offset_paginated = False
 
     schema = th.PropertiesList(
         th.Property("BuyOrderRowId", th.IntegerType),
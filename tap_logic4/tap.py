@@ -1,5 +1,6 @@
 """Logic4 tap class."""
 
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
 from singer_sdk import Stream, Tap
@@ -84,12 +85,168 @@ class TapLogic4(Tap):
             "start_date",
             th.DateTimeType,
         ),
+        th.Property(
+            "child_concurrency",
+            th.IntegerType,
+        ),
+        th.Property(
+            "child_batch_size",
+            th.IntegerType,
+        ),
+        th.Property(
+            "page_prefetch",
+            th.IntegerType,
+        ),
+        th.Property(
+            "stream_records",
+            th.BooleanType,
+        ),
+        th.Property(
+            "partition_concurrency",
+            th.IntegerType,
+        ),
+        th.Property(
+            "adaptive_page_size",
+            th.BooleanType,
+        ),
+        th.Property(
+            "page_latency_target",
+            th.NumberType,
+        ),
+        th.Property(
+            "http_pool_size",
+            th.IntegerType,
+        ),
+        th.Property(
+            "connect_timeout",
+            th.NumberType,
+        ),
+        th.Property(
+            "read_timeout",
+            th.NumberType,
+        ),
+        th.Property(
+            "gzip_requests",
+            th.BooleanType,
+        ),
+        th.Property(
+            "async_transport",
+            th.BooleanType,
+        ),
+        th.Property(
+            "token_persistence",
+            th.StringType,
+        ),
+        th.Property(
+            "token_renewal_fraction",
+            th.NumberType,
+        ),
+        th.Property(
+            "stream_concurrency",
+            th.IntegerType,
+        ),
+        th.Property(
+            "max_requests_per_second",
+            th.NumberType,
+        ),
+        th.Property(
+            "request_burst",
+            th.IntegerType,
+        ),
+        th.Property(
+            "output_buffer_size",
+            th.IntegerType,
+        ),
+        th.Property(
+            "output_flush_interval",
+            th.NumberType,
+        ),
+        th.Property(
+            "keyset_pagination",
+            th.BooleanType,
+        ),
+        th.Property(
+            "backfill_window_records",
+            th.IntegerType,
+        ),
+        th.Property(
+            "checkpoint_interval",
+            th.NumberType,
+        ),
+        th.Property(
+            "dedup_index_dir",
+            th.StringType,
+        ),
+        th.Property(
+            "batch_config",
+            th.ObjectType(
+                th.Property(
+                    "encoding",
+                    th.ObjectType(
+                        th.Property("format", th.StringType),
+                        th.Property("compression", th.StringType),
+                        th.Property("compression_level", th.IntegerType),
+                    ),
+                ),
+                th.Property(
+                    "storage",
+                    th.ObjectType(
+                        th.Property("root", th.StringType),
+                        th.Property("prefix", th.StringType),
+                    ),
+                ),
+                th.Property("streams", th.ArrayType(th.StringType)),
+                th.Property("max_records", th.IntegerType),
+                th.Property("max_bytes", th.IntegerType),
+            ),
+        ),
     ).to_dict()
 
     def discover_streams(self) -> List[Stream]:
         """Return a list of discovered streams."""
         return [stream_class(tap=self) for stream_class in STREAM_TYPES]
 
+    def sync_all(self) -> None:  # type: ignore[misc]
+        """Sync all streams, ``stream_concurrency`` top-level streams at a time.
+
+        singer-sdk marks ``Tap.sync_all`` final, but it syncs the streams one after
+        the other and the CLI calls nothing else, so there is no hook to run them
+        concurrently. Without ``stream_concurrency`` the SDK implementation runs.
+        """
+        concurrency = int(self.config.get("stream_concurrency") or 1)
+        if concurrency <= 1:
+            super().sync_all()
+            return
+        self._reset_state_progress_markers()
+        self._set_compatible_replication_methods()
+        streams = []
+        for stream in self.streams.values():
+            if not stream.selected and not stream.has_selected_descendents:
+                self.logger.info(f"Skipping deselected stream '{stream.name}'.")
+                continue
+            # child streams are synced by their parent
+            if not stream.parent_stream_type:
+                streams.append(stream)
+
+        # top-level streams share nothing but the tap state, in which each one
+        # only changes its own bookmarks, and the message writer
+        with ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="tap-logic4-stream"
+        ) as executor:
+            futures = [executor.submit(self._sync_stream, stream) for stream in streams]
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    @staticmethod
+    def _sync_stream(stream: Stream) -> None:
+        stream.sync()
+        stream.finalize_state_progress_markers()
+
 
 if __name__ == "__main__":
     TapLogic4.cli()
@@ -0,0 +1,98 @@
+"""Tests for the asyncio transport against a local stub server."""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+pytest.importorskip("aiohttp")
+
+from tap_logic4.aio import AsyncTransport  # noqa: E402
+from tap_logic4.tests.test_sync import _sync  # noqa: E402
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path == "/slow":
+            time.sleep(1)
+        status = 500 if self.path == "/error" else 200
+        data = json.dumps({"Records": [body], "RecordsCounter": 1}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def _prepare(url, payload):
+    return requests.Request("POST", url, json=payload).prepare()
+
+
+def test_async_transport_returns_requests_responses(stub_url):
+    """Concurrent requests resolve to regular responses in submission order."""
+    transport = AsyncTransport(limit=4)
+    try:
+        futures = [
+            transport.submit(_prepare(f"{stub_url}/page", {"SkipRecords": i}), (5, 5))
+            for i in range(10)
+        ]
+        responses = [future.result() for future in futures]
+        assert [r.json()["Records"][0]["SkipRecords"] for r in responses] == list(
+            range(10)
+        )
+        assert all(r.status_code == 200 for r in responses)
+
+        error = transport.send(_prepare(f"{stub_url}/error", {}), (5, 5))
+        assert error.status_code == 500
+
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            transport.send(_prepare(f"{stub_url}/slow", {}), (5, 0.2))
+    finally:
+        transport.close()
+
+
+@pytest.mark.parametrize(
+    "streams, profile",
+    [
+        (["orders", "order_rows"], {"orders": 500, "page_cap": 100}),
+        (["products", "supplier_products"], {"products": 200, "latency_jitter": 0.02}),
+    ],
+)
+def test_async_sync_writes_the_records_of_the_threaded_sync(tmp_path, streams, profile):
+    """Pages and children sent on the async transport are written in the same order."""
+    config = {"page_prefetch": 4, "child_concurrency": 4}
+    threaded, threaded_messages = _sync(
+        tmp_path, streams, config, profile, name="threaded"
+    )
+    asynchronous, async_messages = _sync(
+        tmp_path, streams, {**config, "async_transport": True}, profile, name="async"
+    )
+    assert threaded["error"] is None
+    assert asynchronous["error"] is None
+    records = [_records(threaded_messages, stream) for stream in streams]
+    assert all(records)
+    assert [_records(async_messages, stream) for stream in streams] == records
+
+
+def _records(messages, stream):
+    # ChangedAt of orders is the time of the sync, see TransactionBaseStream
+    return [
+        {key: value for key, value in message["record"].items() if key != "ChangedAt"}
+        for message in messages
+        if message["type"] == "RECORD" and message["stream"] == stream
+    ]
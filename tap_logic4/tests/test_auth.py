@@ -0,0 +1,237 @@
+"""Tests for the Logic4 authenticator."""
+
+import json
+import os
+import stat
+import threading
+import time
+
+import pytest
+
+from tap_logic4 import auth
+from tap_logic4.auth import (
+    RENEWAL_RETRY_DELAY,
+    TOKEN_EXPIRY_MARGIN,
+    Logic4Authenticator,
+)
+from tap_logic4.tap import TapLogic4
+
+CONFIG = {
+    "public_key": "public",
+    "company_key": "company",
+    "username": "user",
+    "secret_key": "secret",
+    "password": "password",
+    "start_date": "2020-01-01T00:00:00Z",
+}
+
+
+@pytest.fixture
+def make_authenticator(tmp_path, monkeypatch):
+    def make_authenticator(config_file=None, shared_config=None, **settings):
+        # every call gets its own instance of the singleton
+        monkeypatch.setattr(
+            Logic4Authenticator, "_SingletonMeta__single_instance", None
+        )
+        if config_file is None:
+            config_file = tmp_path / "config.json"
+            config_file.write_text(json.dumps({**CONFIG, **settings}))
+        config = [str(config_file)] + ([str(shared_config)] if shared_config else [])
+        tap = TapLogic4(config=config)
+        return Logic4Authenticator(
+            stream=tap.streams["orders"],
+            auth_endpoint="http://localhost/token",
+            oauth_scopes="",
+        )
+
+    return make_authenticator
+
+
+def test_expired_token_is_refreshed_once_for_concurrent_requests(make_authenticator):
+    """Threads finding an expired token wait for a single refresh."""
+    authenticator = make_authenticator(
+        access_token="old", expires_in=int(time.time()) - 10
+    )
+    refreshes = []
+
+    def update_access_token():
+        refreshes.append(threading.current_thread().name)
+        time.sleep(0.1)
+        authenticator._set_token("new", int(time.time()) + 3600)
+
+    authenticator.update_access_token = update_access_token
+    barrier = threading.Barrier(8)
+    headers = []
+
+    def request():
+        barrier.wait(5)
+        headers.append(authenticator.auth_headers)
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert len(refreshes) == 1
+    assert headers == [{"Authorization": "Bearer new"}] * 8
+
+
+def test_cached_token_is_used_until_its_deadline(make_authenticator):
+    """A token from the config with time left is used without a token request."""
+    authenticator = make_authenticator(
+        access_token="cached", expires_in=int(time.time()) + 3600
+    )
+
+    def update_access_token():
+        raise AssertionError("the cached token is still valid")
+
+    authenticator.update_access_token = update_access_token
+    assert authenticator.is_token_valid()
+    assert authenticator.auth_headers == {"Authorization": "Bearer cached"}
+
+
+class FakeTimer:
+    """A renewal timer that records its delay instead of running."""
+
+    def __init__(self, delay, function):
+        self.delay = delay
+        self.function = function
+        self.cancelled = False
+
+    def start(self):
+        pass
+
+    def cancel(self):
+        self.cancelled = True
+
+
+@pytest.fixture
+def timers(monkeypatch):
+    timers = []
+
+    def make_timer(delay, function):
+        timers.append(FakeTimer(delay, function))
+        return timers[-1]
+
+    monkeypatch.setattr(auth.threading, "Timer", make_timer)
+    return timers
+
+
+def test_renewal_is_scheduled_at_a_fraction_of_the_lifetime(make_authenticator, timers):
+    lifetime = 3600 + TOKEN_EXPIRY_MARGIN
+    authenticator = make_authenticator(
+        access_token="old",
+        expires_in=int(time.time()) + lifetime,
+        token_renewal_fraction=0.75,
+    )
+    assert len(timers) == 1
+    assert timers[0].delay == pytest.approx(3600 * 0.75, abs=2)
+    assert timers[0].function == authenticator._renew_token
+
+    # a new token replaces the pending renewal with one for its own lifetime
+    authenticator._set_token("new", int(time.time()) + 600 + TOKEN_EXPIRY_MARGIN)
+    assert timers[0].cancelled
+    assert timers[1].delay == pytest.approx(600 * 0.75, abs=2)
+
+
+def test_no_renewal_without_a_fraction_or_a_token(make_authenticator, timers):
+    make_authenticator(access_token="old", expires_in=int(time.time()) + 3600)
+    make_authenticator(token_renewal_fraction=0.75)
+    assert timers == []
+
+
+def test_failed_renewal_keeps_the_token_and_retries(make_authenticator, timers):
+    """Requests use the current token while a renewal runs and after it fails."""
+    authenticator = make_authenticator(
+        access_token="old",
+        expires_in=int(time.time()) + 3600,
+        token_renewal_fraction=0.5,
+    )
+    started, release = threading.Event(), threading.Event()
+
+    def update_access_token():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("Failed OAuth login")
+
+    authenticator.update_access_token = update_access_token
+    renewal = threading.Thread(target=timers[-1].function)
+    renewal.start()
+    assert started.wait(5)
+    # the renewal holds the refresh lock, requests do not wait for it
+    assert authenticator.auth_headers == {"Authorization": "Bearer old"}
+    release.set()
+    renewal.join(5)
+
+    assert authenticator.auth_headers == {"Authorization": "Bearer old"}
+    assert timers[-1].delay == RENEWAL_RETRY_DELAY
+
+    # close to the expiry the retry comes sooner, an expired token is not retried
+    authenticator._token_deadline = time.monotonic() + 20
+    authenticator._renew_token()
+    assert timers[-1].delay == pytest.approx(10, abs=1)
+    retries = len(timers)
+    authenticator._token_deadline = time.monotonic() - 1
+    authenticator._renew_token()
+    assert len(timers) == retries
+
+
+def test_renewal_skips_a_token_refreshed_while_it_waited(make_authenticator, timers):
+    """A renewal waiting on the refresh lock doesn't replace a fresh token."""
+    authenticator = make_authenticator(
+        access_token="old",
+        expires_in=int(time.time()) + 3600,
+        token_renewal_fraction=0.5,
+    )
+    refreshes = []
+    authenticator.update_access_token = lambda: refreshes.append("renewal")
+    with authenticator._refresh_lock:
+        renewal = threading.Thread(target=authenticator._renew_token)
+        renewal.start()
+        renewal.join(0.1)
+        # a request refreshes the token while the renewal waits for the lock
+        authenticator._set_token("new", int(time.time()) + 3600)
+    renewal.join(5)
+    assert refreshes == []
+    assert authenticator.auth_headers == {"Authorization": "Bearer new"}
+
+
+def test_persisted_token_keeps_the_config_file_mode_and_link(
+    tmp_path, make_authenticator
+):
+    """Writing a token replaces the target of a symlinked config, with its mode."""
+    secrets = tmp_path / "secrets"
+    secrets.mkdir()
+    target = secrets / "config.json"
+    target.write_text(json.dumps(CONFIG))
+    os.chmod(target, 0o600)
+    link = tmp_path / "config.json"
+    link.symlink_to(target)
+
+    authenticator = make_authenticator(link)
+    authenticator._tap._config.update(access_token="token", expires_in=1)
+    authenticator.persist_token()
+
+    assert link.is_symlink()
+    assert json.loads(target.read_text())["access_token"] == "token"
+    assert stat.S_IMODE(os.stat(target).st_mode) == 0o600
+    assert os.listdir(secrets) == ["config.json"]
+
+
+def test_persisted_token_leaves_out_other_config_files(tmp_path, make_authenticator):
+    """Settings of a second config file, e.g. a fleet's, are not persisted."""
+    config_file = tmp_path / "acme.json"
+    config_file.write_text(json.dumps(CONFIG))
+    shared_config = tmp_path / "fleet-config.json"
+    shared_config.write_text(json.dumps({"stream_concurrency": 2}))
+
+    authenticator = make_authenticator(config_file, shared_config)
+    assert authenticator.config["stream_concurrency"] == 2
+    authenticator._tap._config.update(access_token="token", expires_in=1)
+    authenticator.persist_token()
+
+    assert json.loads(config_file.read_text()) == {
+        **CONFIG,
+        "access_token": "token",
+        "expires_in": 1,
+    }
@@ -0,0 +1,31 @@
+"""Tests for the backfill window planner."""
+
+import datetime
+
+from tap_logic4.backfill import plan_windows
+
+
+def test_windows_are_split_by_record_count():
+    start = datetime.datetime(2010, 1, 1)
+    end = datetime.datetime(2020, 1, 1)
+    busy_from = datetime.datetime(2019, 1, 1)
+
+    # one record a day, and a busy 2019 with a hundred a day
+    def count(window_start, window_end):
+        days = (window_end - window_start).days
+        busy = max(0, (window_end - max(window_start, busy_from)).days)
+        return days + 99 * busy
+
+    windows = plan_windows(start, end, lambda s, e: count(s, e) > 5000)
+    assert windows[0][0] == start and windows[-1][1] == end
+    assert all(a[1] == b[0] for a, b in zip(windows, windows[1:]))
+    assert all(count(s, e) <= 5000 for s, e in windows)
+    assert len([w for w in windows if w[0] < datetime.datetime(2019, 1, 1)]) < 5
+
+
+def test_windows_stop_at_minimum_length():
+    start = datetime.datetime(2020, 1, 1)
+    end = start + datetime.timedelta(hours=3)
+    windows = plan_windows(start, end, lambda s, e: True)
+    assert all(e - s >= datetime.timedelta(minutes=45) for s, e in windows)
+    assert windows[0][0] == start and windows[-1][1] == end
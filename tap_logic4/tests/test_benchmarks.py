@@ -0,0 +1,42 @@
+"""Tests for the benchmark stub, recording and replaying a sync."""
+
+import json
+
+from benchmarks.micro import MICRO_CASES, format_result
+from benchmarks.stub import Logic4Stub, StubProfile
+from benchmarks.suite import BASE_CONFIG, run_worker
+
+
+def test_recorded_sync_replays_offline(tmp_path):
+    """A sync recorded through the stub gets the same records from the cassette."""
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps(BASE_CONFIG))
+    cassette = str(tmp_path / "cassette")
+    streams = ["orders", "order_rows"]
+    profile = StubProfile(orders=30, rows_per_order=2, latency=0)
+
+    with Logic4Stub(profile) as upstream, Logic4Stub(
+        cassette=cassette,
+        record=True,
+        upstream=upstream.url,
+        token_upstream=upstream.token_url,
+    ) as recorder:
+        recorded = run_worker(recorder, streams, str(config), str(tmp_path), "record")
+    assert recorded["error"] is None
+    assert recorded["records"] == {"orders": 30, "order_rows": 60}
+
+    with Logic4Stub(cassette=cassette) as replayer:
+        replayed = run_worker(replayer, streams, str(config), str(tmp_path), "replay")
+        counters = replayer.reset()
+    assert replayed["records"] == recorded["records"]
+    assert counters["missing"] == 0
+    assert replayed["peak_rss_mb"] > 0
+
+
+def test_micro_benchmarks_time_both_code_paths():
+    """Every micro-benchmark case times the replaced code and the tap's code."""
+    for name, case in MICRO_CASES.items():
+        result = case(records=200, repeat=1)
+        assert result["records"] == 200
+        assert result["reference_seconds"] > 0 and result["tap_seconds"] > 0
+        assert name in format_result(name, result)
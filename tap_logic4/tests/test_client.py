@@ -0,0 +1,161 @@
+"""Tests for the Logic4 stream base class, with its requests answered locally."""
+
+import json
+
+import pytest
+import requests
+from singer_sdk.exceptions import RetriableAPIError
+
+from tap_logic4.client import Logic4Stream
+from tap_logic4.tap import TapLogic4
+
+CONFIG = {
+    "public_key": "public",
+    "company_key": "company",
+    "username": "user",
+    "secret_key": "secret",
+    "password": "password",
+    "start_date": "2020-01-01T00:00:00Z",
+}
+
+
+@pytest.fixture
+def make_tap(tmp_path, monkeypatch):
+    monkeypatch.setattr(Logic4Stream, "authenticator", None)
+
+    def make_tap(state=None, **settings):
+        config = tmp_path / "config.json"
+        config.write_text(json.dumps({**CONFIG, **settings}))
+        return TapLogic4(config=[str(config)], state=state)
+
+    return make_tap
+
+
+def _response(records, status_code=200):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(
+        {"Records": records, "RecordsCounter": len(records)}
+    ).encode()
+    return response
+
+
+def test_batched_children_are_split_by_parent(make_tap, monkeypatch):
+    """A multi-ID request pages past a capped TakeRecords and keeps parent order."""
+    stream = make_tap(child_batch_size=4).streams["supplier_products"]
+    codes = ["3-0", "1-0", "99-0", "1-1", "4-0", "3-1", "1-2"]
+    rows = [
+        {"ProductId": int(code.split("-")[0]), "CreditorProductCode": code}
+        for code in codes
+    ]
+    payloads = []
+
+    def request(prepared_request, context):
+        payload = json.loads(prepared_request.body)
+        payloads.append(payload)
+        skip = payload.get("SkipRecords", 0)
+        # the server returns at most 3 records, whatever TakeRecords asks for
+        end = skip + 3
+        return _response(rows[skip:end])
+
+    monkeypatch.setattr(stream, "_request", request)
+    batches = stream._fetch_batch([{"ProductId": id_} for id_ in (1, 2, 3, 4)])
+
+    assert [[row["CreditorProductCode"] for row in batch] for batch in batches] == [
+        ["1-0", "1-1", "1-2"],
+        [],
+        ["3-0", "3-1"],
+        ["4-0"],
+    ]
+    assert payloads[0]["ProductIds"] == [1, 2, 3, 4]
+    assert [payload.get("SkipRecords", 0) for payload in payloads] == [0, 3, 6, 7]
+
+
+def test_page_size_is_kept_in_state(make_tap):
+    """The adaptive page size starts from the state and is written back to it."""
+    state = {"bookmarks": {"orders": {"page_size": 2400}}}
+    stream = make_tap(state, adaptive_page_size=True).streams["orders"]
+    stream._init_page_sizer()
+    assert stream.current_page_size == 2400
+    stream._page_sizer.failed(2400)
+    stream._write_state_message()
+    assert stream.output.last_state["bookmarks"]["orders"]["page_size"] == 1200
+
+
+@pytest.mark.parametrize(
+    "error, shrinks",
+    [
+        (RetriableAPIError("throttled", _response([], 429)), False),
+        (RetriableAPIError("unavailable", _response([], 503)), True),
+        (requests.exceptions.ReadTimeout("timed out"), True),
+    ],
+)
+def test_page_size_shrinks_on_server_errors_only(make_tap, monkeypatch, error, shrinks):
+    stream = make_tap(adaptive_page_size=True).streams["orders"]
+    stream._init_page_sizer()
+    size = stream.current_page_size
+
+    def request(prepared_request, context):
+        raise error
+
+    monkeypatch.setattr(stream, "_request", request)
+    with pytest.raises(type(error)):
+        stream._send_page(None, None)
+    assert (stream.current_page_size < size) == shrinks
+
+
+def test_failed_backfill_probe_keeps_the_page_size(make_tap, monkeypatch):
+    """A probe asks for one record, its failure does not shrink the page size."""
+    stream = make_tap(adaptive_page_size=True).streams["products"]
+    stream._init_page_sizer()
+    size = stream.current_page_size
+    requests_sent = []
+
+    def request(prepared_request, context):
+        requests_sent.append(json.loads(prepared_request.body))
+        raise RetriableAPIError("unavailable", _response([], 503))
+
+    monkeypatch.setattr(stream, "_request", request)
+    monkeypatch.setattr(stream, "request_decorator", lambda func: func)
+    with pytest.raises(RetriableAPIError):
+        stream._window_is_full({}, 500)
+    assert requests_sent[0]["TakeRecords"] == 1
+    assert stream.current_page_size == size
+
+
+def test_stock_rows_keep_their_warehouse(make_tap):
+    """Stock rows are keyed per warehouse, even when WarehouseId is deselected."""
+    stream = make_tap().streams["stocks"]
+    assert stream.primary_keys == ["ProductId", "WarehouseId"]
+    stream.metadata[("properties", "WarehouseId")].selected = False
+    stream.metadata[("properties", "QtyReserved")].selected = False
+    stream._mask = None
+    row = {"ProductId": 1, "WarehouseId": 2, "QtyReserved": 0, "Qty": 5}
+    assert stream.record_pruner(dict(row)) == {
+        "ProductId": 1,
+        "WarehouseId": 2,
+        "Qty": 5,
+    }
+
+
+def test_record_functions_are_compiled_with_the_catalog(
+    tmp_path, make_tap, monkeypatch
+):
+    """The conformer and pruner are compiled when the input catalog is applied."""
+    catalog = make_tap().catalog_dict
+    entry = next(e for e in catalog["streams"] if e["tap_stream_id"] == "stocks")
+    for metadata in entry["metadata"]:
+        if metadata["breadcrumb"] == ["properties", "QtyReserved"]:
+            metadata["metadata"]["selected"] = False
+
+    compiled = []
+    monkeypatch.setattr(
+        "tap_logic4.client.compile_conformer",
+        lambda *args: compiled.append(args[0]) or (lambda record: record),
+    )
+    tap = TapLogic4(config=[str(tmp_path / "config.json")], catalog=catalog)
+    stream = tap.streams["stocks"]
+    assert "stocks" in compiled
+    assert stream.record_conformer is stream._record_conformer
+    row = {"ProductId": 1, "WarehouseId": 2, "QtyReserved": 0, "Qty": 5}
+    assert stream.record_pruner(row) == {"WarehouseId": 2, "ProductId": 1, "Qty": 5}
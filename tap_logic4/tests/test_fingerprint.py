@@ -0,0 +1,40 @@
+"""Tests for the stock fingerprint index."""
+
+from tap_logic4.fingerprint import FingerprintIndex
+
+
+def test_index_emits_changed_and_removed_rows(tmp_path):
+    path = str(tmp_path / "stocks.idx")
+    rows = [
+        {"ProductId": 1, "WarehouseId": 1, "Qty": 5.0},
+        {"ProductId": 1, "WarehouseId": 2, "Qty": 0.0},
+        {"ProductId": 2, "WarehouseId": 1, "Qty": 3.0},
+    ]
+    index = FingerprintIndex(path, ("ProductId", "WarehouseId"))
+    index.load()
+    assert list(index.changed(rows)) == rows
+    index.save()
+
+    index = FingerprintIndex(path, ("ProductId", "WarehouseId"))
+    index.load()
+    changed = [
+        {"WarehouseId": 1, "ProductId": 1, "Qty": 5.0},
+        {"ProductId": 2, "WarehouseId": 1, "Qty": 4.0},
+    ]
+    assert list(index.changed(changed)) == [changed[1]]
+    assert list(index.removed()) == [(1, 2)]
+
+
+def test_merged_index_keeps_unseen_records(tmp_path):
+    path = str(tmp_path / "orders.idx")
+    index = FingerprintIndex(path, ("Id",), ignored=("ChangedAt",))
+    index.load()
+    assert index.is_changed({"Id": 1, "ChangedAt": "2022-01-01T10:00:00+01:00"})
+    assert index.is_changed({"Id": 2, "ChangedAt": "2022-01-01T10:00:00+01:00"})
+    index.save(merge=True)
+
+    index = FingerprintIndex(path, ("Id",), ignored=("ChangedAt",))
+    index.load()
+    assert not index.is_changed({"Id": 2, "ChangedAt": "2022-01-02T10:00:00+01:00"})
+    index.save(merge=True)
+    assert set(index.previous) == {(1,), (2,)}
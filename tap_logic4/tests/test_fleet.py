@@ -0,0 +1,21 @@
+"""Tests for the multi-tenant runner."""
+
+import json
+
+from tap_logic4.fleet import run_fleet
+
+
+def test_failed_tenant_is_reported(tmp_path):
+    config_file = tmp_path / "acme.json"
+    config_file.write_text(json.dumps({"company_key": "acme"}))
+    output_dir = tmp_path / "out"
+
+    tenants = [{"name": "acme", "config": str(config_file)}]
+    summary = run_fleet(tenants, str(output_dir), 1)
+
+    assert summary["failed"] == 1
+    report = summary["tenants"][0]
+    assert report["status"] == "failed"
+    assert report["error"].startswith("ConfigValidationError")
+    assert json.loads((output_dir / "summary.json").read_text()) == summary
+    assert "Traceback" in (output_dir / "acme" / "tap.log").read_text()
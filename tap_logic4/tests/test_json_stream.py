@@ -0,0 +1,46 @@
+"""Tests for the incremental Records parser."""
+
+import json
+
+from tap_logic4.json_stream import RecordsReader
+
+
+def _chunks(body: bytes, size: int):
+    chunks = []
+    while body:
+        chunks.append(body[:size])
+        body = body[size:]
+    return chunks
+
+
+def test_records_reader_matches_json_loads():
+    """Records and the other keys survive any chunk boundary."""
+    page = {
+        "RecordsCounter": 3,
+        "Records": [
+            {"ProductId": 1234567, "Description": "Fiets één", "Price": 12.5},
+            {"ProductId": 2, "IsActive": True, "Barcode": None, "Tags": [1, 2]},
+            {"ProductId": 30, "Description": 'quote " and , ]'},
+        ],
+        "Trailer": {"Total": 1e3},
+    }
+    body = json.dumps(page, ensure_ascii=False).encode()
+    for size in (1, 2, 3, 7, 64, len(body)):
+        reader = RecordsReader(_chunks(body, size))
+        assert list(reader) == page["Records"]
+        assert reader.payload == {"RecordsCounter": 3, "Trailer": {"Total": 1000.0}}
+
+
+def test_records_reader_edge_cases():
+    """Empty pages and non-object bodies are handled like a full decode."""
+    reader = RecordsReader([b'{"Records": [], "RecordsCounter": 0}'])
+    assert list(reader) == []
+    assert reader.payload == {"RecordsCounter": 0}
+
+    reader = RecordsReader([b"{}"])
+    assert list(reader) == []
+    assert reader.payload == {}
+
+    reader = RecordsReader(_chunks(b'[{"Id": 1}]', 2))
+    assert list(reader) == []
+    assert reader.payload == [{"Id": 1}]
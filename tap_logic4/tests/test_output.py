@@ -0,0 +1,137 @@
+"""Tests for the buffered Singer message writer."""
+
+import gzip
+import io
+import json
+import threading
+
+import pytest
+
+from tap_logic4.output import MessageWriter, pyarrow
+
+
+def test_records_are_written_before_state(monkeypatch):
+    out = io.StringIO()
+    monkeypatch.setattr("sys.stdout", out)
+    writer = MessageWriter(buffer_size=1024 * 1024, flush_interval=3600)
+    writer.write_record("orders", {"Id": 1, "Description": "één"})
+    writer.write_record("orders", {"Id": 2})
+    assert out.getvalue() == ""
+
+    state = {"bookmarks": {"orders": {"replication_key_value": "2022-01-01"}}}
+    writer.write_state(state)
+    writer.write_state(state)
+    messages = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [m["type"] for m in messages] == ["RECORD", "RECORD", "STATE"]
+    assert messages[0]["stream"] == "orders"
+    assert messages[0]["record"] == {"Id": 1, "Description": "één"}
+    assert messages[0]["time_extracted"].endswith("Z")
+    assert messages[2]["value"] == state
+
+
+def test_buffer_is_flushed_at_size_threshold(monkeypatch):
+    out = io.StringIO()
+    monkeypatch.setattr("sys.stdout", out)
+    writer = MessageWriter(buffer_size=0, flush_interval=3600)
+    writer.write_record("orders", {"Id": 1})
+    assert json.loads(out.getvalue())["record"] == {"Id": 1}
+
+
+def test_old_records_are_flushed_before_waiting(monkeypatch):
+    """Buffered records are written once they are due, without a new record."""
+    out = io.StringIO()
+    monkeypatch.setattr("sys.stdout", out)
+    clock = [100.0]
+    monkeypatch.setattr("tap_logic4.output.time.monotonic", lambda: clock[0])
+    writer = MessageWriter(buffer_size=1024 * 1024, flush_interval=1)
+    writer.write_record("orders", {"Id": 1})
+    writer.flush_if_due()
+    assert out.getvalue() == ""
+
+    clock[0] += 1
+    # only the thread buffering the records may write them out
+    other = threading.Thread(target=writer.flush_if_due)
+    other.start()
+    other.join()
+    assert out.getvalue() == ""
+    writer.flush_if_due()
+    assert json.loads(out.getvalue())["record"] == {"Id": 1}
+
+
+def test_concurrent_streams_write_whole_messages(monkeypatch):
+    out = io.StringIO()
+    monkeypatch.setattr("sys.stdout", out)
+    writer = MessageWriter(buffer_size=512, flush_interval=3600, concurrent=True)
+
+    def write(stream):
+        for i in range(2000):
+            writer.write_record(stream, {"Id": i})
+
+    threads = [threading.Thread(target=write, args=(name,)) for name in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.write_state({"bookmarks": {}})
+    messages = [json.loads(line) for line in out.getvalue().splitlines()]
+    for stream in ("a", "b"):
+        ids = [m["record"]["Id"] for m in messages if m.get("stream") == stream]
+        assert ids == list(range(2000))
+    assert messages[-1]["type"] == "STATE"
+
+
+def test_batch_files_are_announced_before_state(monkeypatch, tmp_path):
+    out = io.StringIO()
+    monkeypatch.setattr("sys.stdout", out)
+    batch_config = {
+        "encoding": {"format": "jsonl", "compression": "gzip"},
+        "storage": {"root": f"file://{tmp_path}"},
+        "streams": ["products"],
+        "max_records": 2,
+    }
+    writer = MessageWriter(1024 * 1024, 3600, batch_config)
+    for product_id in range(3):
+        writer.write_record("products", {"ProductId": product_id})
+    writer.write_state({"bookmarks": {"products": {}}})
+    assert [json.loads(line)["type"] for line in out.getvalue().splitlines()] == [
+        "BATCH"
+    ]
+
+    writer.close_batches()
+    messages = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [m["type"] for m in messages] == ["BATCH", "BATCH", "STATE"]
+    records = []
+    for message in messages[:2]:
+        path = message["manifest"][0].replace("file://", "", 1)
+        with gzip.open(path) as batch_file:
+            records.extend(json.loads(line) for line in batch_file)
+    assert records == [{"ProductId": 0}, {"ProductId": 1}, {"ProductId": 2}]
+
+
+@pytest.mark.parametrize(
+    "encoding",
+    [
+        {"format": "jsonl", "compression": "gzip"},
+        pytest.param(
+            {"format": "parquet", "compression": "snappy"},
+            marks=pytest.mark.skipif(pyarrow is None, reason="needs pyarrow"),
+        ),
+    ],
+)
+def test_batch_files_roll_over_at_max_bytes(monkeypatch, tmp_path, encoding):
+    out = io.StringIO()
+    monkeypatch.setattr("sys.stdout", out)
+    record = {"ProductId": 1, "ProductName1": "Fiets"}
+    batch_config = {
+        "encoding": encoding,
+        "storage": {"root": f"file://{tmp_path}"},
+        # the uncompressed JSON of two records
+        "max_bytes": 2 * (len(json.dumps(record, separators=(",", ":"))) + 1),
+    }
+    writer = MessageWriter(1024 * 1024, 3600, batch_config)
+    for _ in range(5):
+        writer.write_record("products", record)
+    writer.close_batches()
+    messages = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [m["type"] for m in messages] == ["BATCH"] * 3
+    assert len(list(tmp_path.iterdir())) == 3
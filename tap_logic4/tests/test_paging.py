@@ -0,0 +1,74 @@
+"""Tests for the adaptive page size and keyset pagination tokens."""
+
+from tap_logic4.paging import (
+    MAX_PAGE_BYTES,
+    MAX_PAGE_SIZE,
+    MIN_PAGE_SIZE,
+    AdaptivePageSize,
+    KeysetPage,
+    KeysetToken,
+)
+
+
+def test_page_size_grows_on_fast_full_pages():
+    sizer = AdaptivePageSize(1000, 10)
+    assert sizer.record(1000, 1000, 1.0, 100 * 1000)
+    assert sizer.size == 1500
+    # short pages and pages near the target leave the size as it is
+    assert not sizer.record(1500, 200, 1.0, 100 * 200)
+    assert not sizer.record(1500, 1500, 7.0, 100 * 1500)
+    assert sizer.size == 1500
+
+
+def test_page_size_growth_is_capped_by_the_page_bytes():
+    sizer = AdaptivePageSize(3000, 10)
+    record_bytes = 10000
+    sizer.record(3000, 3000, 1.0, record_bytes * 3000)
+    assert sizer.size == MAX_PAGE_BYTES // record_bytes
+
+
+def test_page_size_shrinks_on_slow_and_failed_pages():
+    sizer = AdaptivePageSize(4000, 10)
+    assert sizer.record(4000, 4000, 12.0, 0)
+    assert sizer.size == 2000
+    assert sizer.failed(2000)
+    assert sizer.size == 1000
+    # a failed page that was sent before the size shrank halves the current size
+    assert sizer.failed(4000)
+    assert sizer.size == 500
+
+
+def test_page_size_stays_within_its_bounds():
+    sizer = AdaptivePageSize(MIN_PAGE_SIZE * 2, 10)
+    sizer.failed(sizer.size)
+    sizer.failed(sizer.size)
+    assert sizer.size == MIN_PAGE_SIZE
+    for _ in range(20):
+        sizer.record(sizer.size, sizer.size, 0.1, sizer.size)
+    assert sizer.size == MAX_PAGE_SIZE
+    # a configured page size outside the bounds widens them
+    assert AdaptivePageSize(50, 10).size == 50
+    assert AdaptivePageSize(MAX_PAGE_SIZE * 2, 10).size == MAX_PAGE_SIZE * 2
+
+
+def _page(*values):
+    page = KeysetPage()
+    for value in values:
+        page.add(value)
+    return page
+
+
+def test_keyset_tokens_skip_records_sharing_the_last_key():
+    token = _page("a", "b", "b").next_token(None, 3)
+    assert token == KeysetToken("b", 2)
+    # a page with only the previous key carries its skip over
+    token = _page("b", "b", "b").next_token(token, 3)
+    assert token == KeysetToken("b", 5)
+    assert _page("b", "c", "d").next_token(token, 3) == KeysetToken("d", 1)
+
+
+def test_unordered_page_falls_back_to_offsets():
+    previous = KeysetToken("b", 1)
+    token = _page("c", "a", "d").next_token(previous, 3)
+    assert token == KeysetToken("b", 4, False)
+    assert _page("e", "f").next_token(token, 2) == KeysetToken("b", 6, False)
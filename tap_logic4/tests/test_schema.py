@@ -0,0 +1,161 @@
+"""Tests for the compiled record conformers."""
+
+import datetime
+import logging
+
+from singer_sdk import typing as th
+from singer_sdk.helpers._catalog import pop_deselected_record_properties
+from singer_sdk.helpers._singer import SelectionMask
+from singer_sdk.helpers._typing import conform_record_data_types
+
+from tap_logic4.schema import compile_conformer, compile_pruner
+
+SCHEMA = th.PropertiesList(
+    th.Property("Id", th.IntegerType),
+    th.Property("Price", th.NumberType),
+    th.Property("IsActive", th.BooleanType),
+    th.Property("Description", th.StringType),
+    th.Property("ChangedAt", th.DateTimeType),
+    th.Property(
+        "Address",
+        th.ObjectType(
+            th.Property("Street", th.StringType),
+            th.Property("Zipcode", th.StringType),
+            th.Property("Number", th.IntegerType),
+        ),
+    ),
+    th.Property("Tags", th.ArrayType(th.StringType)),
+).to_dict()
+
+LOGGER = logging.getLogger("test")
+
+
+def test_conformer_matches_sdk():
+    """JSON records come out exactly as the SDK's generic path conforms them."""
+    mask = SelectionMask(
+        {
+            (): True,
+            ("properties", "Description"): False,
+            ("properties", "Address", "properties", "Zipcode"): False,
+        }
+    )
+    conform = compile_conformer("products", SCHEMA, mask, LOGGER)
+    records = [
+        {
+            "Id": 1,
+            "Price": 12.5,
+            "IsActive": 0,
+            "Description": "Fiets",
+            "ChangedAt": datetime.datetime(2022, 3, 1, 12, 30),
+            "Address": {"Street": "Dam", "Zipcode": "1012", "Number": 1, "Extra": 2},
+            "Tags": ["a"],
+            "Unknown": 1,
+        },
+        {"Id": 2, "IsActive": None, "Address": None, "Price": None},
+    ]
+    for record in records:
+        expected = dict(record, Address=record["Address"] and dict(record["Address"]))
+        pop_deselected_record_properties(expected, SCHEMA, mask, LOGGER)
+        expected = conform_record_data_types("products", expected, SCHEMA, LOGGER)
+        assert conform(record) == expected
+
+
+def test_conformer_coerces_numeric_strings():
+    conform = compile_conformer("products", SCHEMA, SelectionMask(), LOGGER)
+    record = conform(
+        {"Id": "12", "Price": "1.5", "IsActive": 1, "Address": {"Number": 3.0}}
+    )
+    assert record == {
+        "Id": 12,
+        "Price": 1.5,
+        "IsActive": True,
+        "Address": {"Number": 3},
+    }
+    assert conform({"Id": "n/a", "Price": ""}) == {"Id": "n/a", "Price": ""}
+
+
+def test_conformer_conforms_nested_objects():
+    """Nested objects and arrays of objects are conformed, the SDK skipped them."""
+    schema = th.PropertiesList(
+        th.Property(
+            "Address",
+            th.ObjectType(
+                th.Property("Number", th.IntegerType),
+                th.Property("IsMain", th.BooleanType),
+                th.Property("ChangedAt", th.DateTimeType),
+            ),
+        ),
+        th.Property(
+            "Rows",
+            th.ArrayType(
+                th.ObjectType(
+                    th.Property("Qty", th.IntegerType),
+                    th.Property("IsDelivered", th.BooleanType),
+                )
+            ),
+        ),
+    ).to_dict()
+    record = {
+        "Address": {
+            "Number": "3",
+            "IsMain": 1,
+            "ChangedAt": datetime.datetime(2022, 3, 1, 12, 30),
+        },
+        "Rows": [{"Qty": 2.0, "IsDelivered": 0}],
+    }
+    sdk_record = conform_record_data_types(
+        "orders",
+        {"Address": dict(record["Address"]), "Rows": [dict(record["Rows"][0])]},
+        schema,
+        LOGGER,
+    )
+    assert sdk_record == record
+
+    conform = compile_conformer("orders", schema, SelectionMask(), LOGGER)
+    assert conform(record) == {
+        "Address": {
+            "Number": 3,
+            "IsMain": True,
+            "ChangedAt": "2022-03-01T12:30:00+00:00",
+        },
+        "Rows": [{"Qty": 2, "IsDelivered": False}],
+    }
+
+
+def test_pruner_drops_deselected_properties():
+    mask = SelectionMask(
+        {
+            (): True,
+            ("properties", "Description"): False,
+            ("properties", "Price"): False,
+            ("properties", "Address", "properties", "Zipcode"): False,
+        }
+    )
+    prune = compile_pruner(SCHEMA, mask, keep=["Price"])
+    record = {
+        "Id": 1,
+        "Price": 2.0,
+        "Description": "Fiets",
+        "Address": {"Street": "Dam", "Zipcode": "1012", "Extra": 2},
+        "Unknown": 1,
+    }
+    assert prune(record) == {
+        "Id": 1,
+        "Price": 2.0,
+        "Address": {"Street": "Dam", "Extra": 2},
+    }
+    assert compile_pruner(SCHEMA, SelectionMask({(): True}), ()) is None
+    assert compile_pruner(SCHEMA, SelectionMask({(): False}), ()) is None
+
+
+def test_pruner_warns_once_about_unknown_properties(caplog):
+    """Properties missing from the schema are dropped with the SDK's warning."""
+    mask = SelectionMask({(): True, ("properties", "Description"): False})
+    prune = compile_pruner(SCHEMA, mask, (), "orders", LOGGER, dropped=["Window"])
+    with caplog.at_level(logging.WARNING):
+        for _ in range(3):
+            assert prune({"Id": 1, "Unknown": 1, "Window": "x"}) == {"Id": 1}
+    assert [record.getMessage() for record in caplog.records] == [
+        "Property 'Unknown' was present in the 'orders' stream but not found in "
+        "catalog schema. Ignoring."
+    ]
@@ -0,0 +1,187 @@
+"""Tests of whole syncs against the benchmark stub of the Logic4 API."""
+
+import json
+
+from benchmarks.stub import Logic4Stub, StubProfile, _changed_at
+from benchmarks.suite import BASE_CONFIG, run_worker
+
+
+def _sync(tmp_path, streams, config=None, profile=None, state=None, name="sync"):
+    """Sync ``streams`` in a worker process, return its result and messages."""
+    config_path = tmp_path / f"{name}.config.json"
+    config_path.write_text(json.dumps({**BASE_CONFIG, **(config or {})}))
+    state_path = None
+    if state is not None:
+        state_path = tmp_path / f"{name}.state.json"
+        state_path.write_text(json.dumps(state))
+    output = tmp_path / f"{name}.jsonl"
+    with Logic4Stub(StubProfile(**{"latency": 0, **(profile or {})})) as stub:
+        result = run_worker(
+            stub,
+            streams,
+            str(config_path),
+            str(tmp_path),
+            name,
+            str(state_path) if state_path else None,
+            str(output),
+        )
+    messages = [json.loads(line) for line in output.read_text().splitlines()]
+    return result, messages
+
+
+def _record_ids(messages, stream, key):
+    return [
+        message["record"][key]
+        for message in messages
+        if message["type"] == "RECORD" and message["stream"] == stream
+    ]
+
+
+def test_interrupted_partition_resumes_after_checkpoint(tmp_path):
+    """A partition that failed mid-way continues at its checkpointed offset."""
+    config = {"checkpoint_interval": 0.000001}
+    profile = {"products": 300, "page_cap": 50}
+    first, first_messages = _sync(
+        tmp_path, ["products"], config, {**profile, "fail_after": 3}, name="first"
+    )
+    assert first["error"]
+    partitions = first["state"]["bookmarks"]["products"]["partitions"]
+    # three pages of the first partition were written before the fourth failed
+    assert partitions[0]["checkpoint"]["skip"] == 150
+    assert partitions[0]["checkpoint"]["window"]
+
+    second, second_messages = _sync(
+        tmp_path, ["products"], config, profile, first["state"], name="second"
+    )
+    assert second["error"] is None
+    written = _record_ids(first_messages, "products", "ProductId") + _record_ids(
+        second_messages, "products", "ProductId"
+    )
+    assert sorted(written) == list(range(1, 301))
+    for partition in second["state"]["bookmarks"]["products"]["partitions"]:
+        assert "checkpoint" not in partition
+        assert partition["replication_key_value"]
+
+
+def test_stream_bookmark_of_an_older_state_applies_to_every_partition(tmp_path):
+    """A products bookmark written before the partitions moves into each of them."""
+    bookmark = "2023-01-01T00:00:00"
+    state = {
+        "bookmarks": {
+            "products": {
+                "replication_key": "DateTimeLastChanged",
+                "replication_key_value": bookmark,
+            }
+        }
+    }
+    # a state with a bookmark does not start a backfill
+    config = {"backfill_window_records": 50}
+    result, messages = _sync(tmp_path, ["products"], config, {"products": 300}, state)
+    assert result["error"] is None
+    written = set(_record_ids(messages, "products", "ProductId"))
+    dates = {index + 1: _changed_at(index, 300) for index in range(300)}
+    assert written
+    assert all(dates[product] > bookmark for product in written)
+    # the bookmark is sent in Amsterdam time
+    assert {p for p, date in dates.items() if date > "2023-01-01T02:00:00"} <= written
+
+    products = result["state"]["bookmarks"]["products"]
+    assert "replication_key_value" not in products
+    assert "backfill" not in products
+    assert len(products["partitions"]) == 4
+    for partition in products["partitions"]:
+        assert partition["replication_key_value"] > bookmark
+
+
+def _covered_products(state, partition_records):
+    """Return the products a STATE message no longer needs to sync again."""
+    covered = set()
+    for partition in state["bookmarks"].get("products", {}).get("partitions", []):
+        context = partition["context"]
+        ids = partition_records.get(
+            (context["IsVisibleOnWebShop"], context["IsVisibleInLogic4"]), []
+        )
+        if partition.get("replication_key_value"):
+            covered.update(ids)
+        elif partition.get("checkpoint"):
+            covered.update(ids[: partition["checkpoint"]["skip"]])
+    return covered
+
+
+def test_children_are_written_in_parent_order_before_state(tmp_path):
+    """Concurrent child fetches keep parent order, and no bookmark passes them."""
+    result, messages = _sync(
+        tmp_path,
+        ["products", "supplier_products"],
+        {"child_concurrency": 4, "checkpoint_interval": 0.01},
+        {"products": 200, "latency_jitter": 0.02},
+    )
+    assert result["error"] is None
+    partition_records = {}
+    for message in messages:
+        if message["type"] == "RECORD" and message["stream"] == "products":
+            record = message["record"]
+            key = (record["IsVisibleOnWebShop"], record["IsVisibleInLogic4"])
+            partition_records.setdefault(key, []).append(record["ProductId"])
+
+    children = set()
+    covered = set()
+    for message in messages:
+        if message["type"] == "RECORD" and message["stream"] == "supplier_products":
+            children.add(message["record"]["ProductId"])
+        elif message["type"] == "STATE":
+            covered = _covered_products(message["value"], partition_records)
+            assert covered <= children
+    assert len(covered) == 200
+
+    parents = _record_ids(messages, "products", "ProductId")
+    rows = _record_ids(messages, "supplier_products", "ProductId")
+    assert list(dict.fromkeys(rows)) == parents
+    assert len(rows) == 2 * len(parents)
+
+
+def test_prefetched_pages_are_written_in_offset_order(tmp_path):
+    """Pages finishing out of order are still written in SkipRecords order."""
+    result, messages = _sync(
+        tmp_path,
+        ["orders"],
+        {"page_prefetch": 4},
+        {"orders": 4500, "latency_jitter": 0.05},
+    )
+    assert result["error"] is None
+    assert _record_ids(messages, "orders", "Id") == list(range(1, 4501))
+
+
+def test_prefetch_continues_after_a_capped_page(tmp_path):
+    """A server capping TakeRecords below the page size doesn't end the stream."""
+    result, messages = _sync(
+        tmp_path,
+        ["orders"],
+        {"page_prefetch": 4},
+        {"orders": 2500, "page_cap": 300, "latency_jitter": 0.01},
+    )
+    assert result["error"] is None
+    assert _record_ids(messages, "orders", "Id") == list(range(1, 2501))
+
+
+def test_stocks_emit_changed_and_removed_rows(tmp_path):
+    """Unchanged stock rows are skipped and rows that disappeared are flagged."""
+    config = {"dedup_index_dir": str(tmp_path / "indexes")}
+    _, first = _sync(tmp_path, ["stocks"], config, {"stock_products": 5}, name="a")
+    assert len(_record_ids(first, "stocks", "ProductId")) == 10
+
+    _, second = _sync(tmp_path, ["stocks"], config, {"stock_products": 4}, name="b")
+    removed = [
+        message["record"]
+        for message in second
+        if message["type"] == "RECORD" and message["stream"] == "stocks"
+    ]
+    assert [(row["ProductId"], row["WarehouseId"]) for row in removed] == [
+        (5, 1),
+        (5, 2),
+    ]
+    assert all(row["_sdc_deleted_at"] for row in removed)
+
+    # the removed rows are forgotten, so they count as new when they come back
+    _, third = _sync(tmp_path, ["stocks"], config, {"stock_products": 5}, name="c")
+    assert _record_ids(third, "stocks", "ProductId") == [5, 5]
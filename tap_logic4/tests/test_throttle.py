@@ -0,0 +1,26 @@
+"""Tests for the shared request scheduler."""
+
+import time
+
+from tap_logic4.throttle import RequestScheduler, parse_retry_after
+
+
+def test_token_bucket_paces_requests():
+    scheduler = RequestScheduler(rate=50, burst=2)
+    start = time.monotonic()
+    for _ in range(7):
+        scheduler.acquire("products")
+    # two requests from the burst, five at 50 per second
+    assert time.monotonic() - start >= 0.09
+    counters = scheduler.pop_counters("products")
+    assert counters["http_requests"] == 7
+    assert counters["http_throttled_seconds"] > 0
+
+
+def test_retry_after_pauses_every_stream():
+    scheduler = RequestScheduler()
+    scheduler.throttled("orders", parse_retry_after("0.1"))
+    assert scheduler.acquire("products") > 0.05
+    assert scheduler.acquire("products") == 0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+    assert parse_retry_after("soon") is None
@@ -0,0 +1,113 @@
+"""Pacing of the requests sent to the Logic4 API."""
+
+import email.utils
+import threading
+import time
+from typing import Dict, Mapping, Optional
+
+# statuses Logic4 answers with when a company key is over its limit
+THROTTLE_STATUSES = (429, 503)
+# never pause all requests for longer than this, whatever Retry-After says
+MAX_RETRY_AFTER = 900.0
+
+_scheduler: Optional["RequestScheduler"] = None
+_scheduler_lock = threading.Lock()
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Return the seconds to wait from a ``Retry-After`` header (seconds or a date)."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            retry_at = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at is None:
+            return None
+        seconds = retry_at.timestamp() - time.time()
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+class RequestScheduler:
+    """Token bucket shared by every stream and thread of the tap.
+
+    Logic4 throttles per company key, so all requests draw from one bucket that
+    refills at ``rate`` requests per second and holds at most ``burst`` tokens.
+    Requests reserve a token in arrival order and sleep until it is theirs, so
+    concurrent streams use the full rate without going over it. Without a rate
+    requests are not paced. A throttled response with ``Retry-After`` pauses
+    every request until that moment.
+    """
+
+    def __init__(self, rate: Optional[float] = None, burst: Optional[int] = None):
+        self.rate = float(rate or 0)
+        self.burst = float(max(burst or 1, 1))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Dict[str, float]] = {}
+
+    def _counters(self, name: str) -> Dict[str, float]:
+        counters = self.counters.get(name)
+        if counters is None:
+            counters = self.counters[name] = {
+                "http_requests": 0,
+                "http_throttled_seconds": 0.0,
+                "http_throttled_responses": 0,
+                "http_retry_after_seconds": 0.0,
+            }
+        return counters
+
+    def acquire(self, name: str) -> float:
+        """Wait until a request of stream ``name`` may be sent, return the wait."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._paused_until)
+            if self.rate:
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                self._tokens -= 1
+                if self._tokens < 0:
+                    start = max(start, now - self._tokens / self.rate)
+            wait = start - now
+            counters = self._counters(name)
+            counters["http_requests"] += 1
+            counters["http_throttled_seconds"] += wait
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def throttled(self, name: str, retry_after: Optional[float]) -> None:
+        """Count a throttled response and pause all requests for ``retry_after``."""
+        with self._lock:
+            counters = self._counters(name)
+            counters["http_throttled_responses"] += 1
+            if retry_after:
+                counters["http_retry_after_seconds"] += retry_after
+                self._paused_until = max(
+                    self._paused_until, time.monotonic() + retry_after
+                )
+
+    def pop_counters(self, name: str) -> Optional[Dict[str, float]]:
+        """Return and reset the counters of stream ``name``."""
+        with self._lock:
+            return self.counters.pop(name, None)
+
+
+def get_scheduler(config: Mapping) -> RequestScheduler:
+    """Return the process-wide request scheduler."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = RequestScheduler(
+                    config.get("max_requests_per_second"), config.get("request_burst")
+                )
+    return _scheduler
@@ -0,0 +1,70 @@
+"""Shared HTTP transport for the Logic4 API and identity server."""
+
+import gzip
+import threading
+from typing import Mapping, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 300
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def pool_size(config: Mapping) -> int:
+    """Return the number of keep-alive connections kept per host."""
+    if config.get("http_pool_size"):
+        return int(config["http_pool_size"])
+    # enough connections for every request the tap may have in flight
+    in_flight = int(config.get("child_concurrency") or 1) + int(
+        config.get("page_prefetch") or 1
+    ) * int(config.get("partition_concurrency") or 1)
+    in_flight *= int(config.get("stream_concurrency") or 1)
+    return max(DEFAULT_POOL_SIZE, in_flight)
+
+
+def get_session(config: Mapping) -> requests.Session:
+    """Return the process-wide session shared by all streams and the authenticator.
+
+    The session keeps one connection pool per host (``api.logic4server.nl`` and
+    ``idp.logic4server.nl``), so connections and TLS sessions are reused across
+    requests, streams and threads.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                size = pool_size(config)
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers["Connection"] = "keep-alive"
+                session.headers["Accept-Encoding"] = "gzip, deflate"
+                _session = session
+    return _session
+
+
+def get_timeout(config: Mapping) -> Tuple[float, float]:
+    """Return the (connect, read) timeout of every request."""
+    return (
+        float(config.get("connect_timeout") or DEFAULT_CONNECT_TIMEOUT),
+        float(config.get("read_timeout") or DEFAULT_READ_TIMEOUT),
+    )
+
+
+def gzip_request_body(request: requests.PreparedRequest) -> requests.PreparedRequest:
+    """Compress the body of a prepared request in place."""
+    body = request.body
+    if not body:
+        return request
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    request.body = gzip.compress(body)
+    request.headers["Content-Encoding"] = "gzip"
+    request.headers["Content-Length"] = str(len(request.body))
+    return request